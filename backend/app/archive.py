@@ -0,0 +1,294 @@
+"""Cold storage for messages that fall out of the retention window.
+
+Old messages are moved from ``messages``/``direct_messages`` into an
+append-only archive database as zlib-compressed segments. Each segment holds
+up to ``ARCHIVE_SEGMENT_SIZE`` consecutive messages of one group or DM thread,
+stored as newline-separated ``MessageRead``/``DirectMessageRead`` JSON, so a
+read-through only has to decompress and splice. Sender names are frozen in
+that JSON when a message is archived; reads swap in the sender's current
+names from the user index so renames show up in archived history too.
+
+Run a retention pass with ``python -m app.archive --days 90``, or set
+``MESSAGE_RETENTION_DAYS`` to have the API run one every
+``ARCHIVE_INTERVAL_SECONDS``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, Index, Integer, LargeBinary, String, create_engine
+from sqlalchemy.orm import (
+    Mapped,
+    declarative_base,
+    joinedload,
+    mapped_column,
+    sessionmaker,
+)
+
+from . import crud, models
+from .database import SessionLocal, connect_args_for
+from .user_index import user_index
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DATABASE_URL = os.getenv("ARCHIVE_DATABASE_URL", "sqlite:///./archive.db")
+ARCHIVE_SEGMENT_SIZE = int(os.getenv("ARCHIVE_SEGMENT_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+MESSAGE_RETENTION_DAYS = os.getenv("MESSAGE_RETENTION_DAYS")
+
+archive_engine = create_engine(
+    ARCHIVE_DATABASE_URL,
+    connect_args=connect_args_for(ARCHIVE_DATABASE_URL),
+)
+ArchiveSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=archive_engine)
+
+ArchiveBase = declarative_base()
+
+
+class ArchiveSegment(ArchiveBase):
+    __tablename__ = "archive_segments"
+    __table_args__ = (Index("ix_archive_segments_scope", "kind", "scope_id", "last_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(10))
+    scope_id: Mapped[int] = mapped_column(Integer)
+    first_id: Mapped[int] = mapped_column(Integer)
+    last_id: Mapped[int] = mapped_column(Integer)
+    message_count: Mapped[int] = mapped_column(Integer)
+    first_created_at: Mapped[datetime] = mapped_column(DateTime)
+    last_created_at: Mapped[datetime] = mapped_column(DateTime)
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# kind -> (hot model, scope column name, encoder)
+SOURCES = {
+    "group": (models.Message, "group_id", crud.encode_message),
+    "thread": (models.DirectMessage, "thread_id", crud.encode_direct_message),
+}
+
+
+def decode_segment(segment: ArchiveSegment) -> list[tuple[int, bytes]]:
+    lines = zlib.decompress(segment.payload).split(b"\n")
+    return [(json.loads(line)["id"], line) for line in lines]
+
+
+def with_current_sender(line: bytes) -> bytes:
+    """Rewrite an archived message's sender fields to the user's current names."""
+    message = json.loads(line)
+    names = user_index.names_for(message["user_id"])
+    if names is None:
+        return line
+    username, full_name = names
+    sender_name = full_name or username
+    if (message["sender_username"], message["sender_name"]) == (username, sender_name):
+        return line
+    message["sender_username"] = username
+    message["sender_name"] = sender_name
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def read_archived(
+    kind: str,
+    scope_id: int,
+    before_id: int | None,
+    limit: int,
+) -> list[tuple[int, bytes]]:
+    """Return up to ``limit`` archived messages older than ``before_id``, oldest first."""
+    archive_db = ArchiveSessionLocal()
+    try:
+        query = archive_db.query(ArchiveSegment).filter(
+            ArchiveSegment.kind == kind,
+            ArchiveSegment.scope_id == scope_id,
+        )
+        if before_id is not None:
+            query = query.filter(ArchiveSegment.first_id < before_id)
+
+        collected: list[tuple[int, bytes]] = []
+        for segment in query.order_by(ArchiveSegment.last_id.desc()).yield_per(4):
+            messages = decode_segment(segment)
+            if before_id is not None:
+                messages = [item for item in messages if item[0] < before_id]
+            collected = messages[-(limit - len(collected)) :] + collected
+            if len(collected) >= limit:
+                break
+        return [(message_id, with_current_sender(line)) for message_id, line in collected]
+    finally:
+        archive_db.close()
+
+
+def iter_archived(kind: str, scope_id: int):
+    """Yield every archived message of a scope as ``(id, json_bytes)``, oldest first."""
+    archive_db = ArchiveSessionLocal()
+    try:
+        segments = (
+            archive_db.query(ArchiveSegment)
+            .filter(ArchiveSegment.kind == kind, ArchiveSegment.scope_id == scope_id)
+            .order_by(ArchiveSegment.first_id.asc())
+            .yield_per(4)
+        )
+        for segment in segments:
+            for message_id, line in decode_segment(segment):
+                yield message_id, with_current_sender(line)
+    finally:
+        archive_db.close()
+
+
+def delete_archived_scope(kind: str, scope_id: int) -> int:
+    archive_db = ArchiveSessionLocal()
+    try:
+        deleted = (
+            archive_db.query(ArchiveSegment)
+            .filter(ArchiveSegment.kind == kind, ArchiveSegment.scope_id == scope_id)
+            .delete(synchronize_session=False)
+        )
+        archive_db.commit()
+        return deleted
+    finally:
+        archive_db.close()
+
+
+def _archive_scope(db, archive_db, kind: str, scope_id: int, cutoff: datetime) -> int:
+    """Move the scope's oldest messages, up to the first one newer than ``cutoff``.
+
+    Only a run of the lowest ids is archived, so every archived id stays below
+    every hot id of the scope and read-through can simply continue below the
+    oldest hot message. A message created before the cutoff but stored after a
+    newer one (e.g. by a bulk import) waits until the cutoff passes its
+    neighbours.
+    """
+    model, column_name, encode = SOURCES[kind]
+    column = getattr(model, column_name)
+    newest_segment = (
+        archive_db.query(ArchiveSegment)
+        .filter(ArchiveSegment.kind == kind, ArchiveSegment.scope_id == scope_id)
+        .order_by(ArchiveSegment.id.desc())
+        .first()
+    )
+    if newest_segment is not None:
+        # A pass that stopped between archiving and deleting leaves exactly
+        # the rows of its last segment behind; delete those and nothing else.
+        archived_ids = [message_id for message_id, _ in decode_segment(newest_segment)]
+        db.query(model).filter(column == scope_id, model.id.in_(archived_ids)).delete(
+            synchronize_session=False
+        )
+        db.commit()
+
+    moved = 0
+    while True:
+        candidates = (
+            db.query(model)
+            .options(joinedload(model.user), joinedload(model.attachment))
+            .filter(column == scope_id)
+            .order_by(model.id.asc())
+            .limit(ARCHIVE_SEGMENT_SIZE)
+            .all()
+        )
+        batch = []
+        for message in candidates:
+            if message.created_at >= cutoff:
+                break
+            batch.append(message)
+        if not batch:
+            return moved
+
+        archive_db.add(
+            ArchiveSegment(
+                kind=kind,
+                scope_id=scope_id,
+                first_id=batch[0].id,
+                last_id=batch[-1].id,
+                message_count=len(batch),
+                first_created_at=min(message.created_at for message in batch),
+                last_created_at=max(message.created_at for message in batch),
+                payload=zlib.compress(b"\n".join(encode(message) for message in batch)),
+            )
+        )
+        archive_db.commit()
+
+        db.query(model).filter(model.id.in_([message.id for message in batch])).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        db.expunge_all()
+        moved += len(batch)
+        if len(batch) < len(candidates):
+            return moved
+
+
+def archive_messages(cutoff: datetime) -> dict[str, int]:
+    """Move every message created before ``cutoff`` into the archive."""
+    moved = {}
+    db = SessionLocal()
+    archive_db = ArchiveSessionLocal()
+    try:
+        for kind, (model, column_name, _) in SOURCES.items():
+            column = getattr(model, column_name)
+            scope_ids = [
+                scope_id
+                for (scope_id,) in db.query(column)
+                .filter(model.created_at < cutoff)
+                .distinct()
+                .all()
+            ]
+            moved[kind] = sum(
+                _archive_scope(db, archive_db, kind, scope_id, cutoff)
+                for scope_id in scope_ids
+            )
+    finally:
+        archive_db.close()
+        db.close()
+    return moved
+
+
+def run_retention(days: float) -> dict[str, int]:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = archive_messages(cutoff)
+    logger.info("Archived messages older than %s: %s", cutoff.isoformat(), moved)
+    return moved
+
+
+def start_retention_worker() -> None:
+    """Run retention periodically if ``MESSAGE_RETENTION_DAYS`` is set."""
+    if not MESSAGE_RETENTION_DAYS:
+        return
+    days = float(MESSAGE_RETENTION_DAYS)
+
+    def loop() -> None:
+        while True:
+            time.sleep(ARCHIVE_INTERVAL_SECONDS)
+            try:
+                run_retention(days)
+            except Exception:
+                logger.exception("Message retention pass failed")
+
+    threading.Thread(target=loop, name="message-retention", daemon=True).start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive messages past the retention window.")
+    parser.add_argument(
+        "--days",
+        type=float,
+        default=float(MESSAGE_RETENTION_DAYS) if MESSAGE_RETENTION_DAYS else None,
+        help="Archive messages older than this many days (default: MESSAGE_RETENTION_DAYS).",
+    )
+    args = parser.parse_args()
+    if args.days is None:
+        parser.error("--days is required when MESSAGE_RETENTION_DAYS is not set")
+
+    from .migrate import check_schema
+
+    logging.basicConfig(level=logging.INFO)
+    check_schema()
+    print(json.dumps(run_retention(args.days)))
+
+
+if __name__ == "__main__":
+    main()
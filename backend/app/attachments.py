@@ -0,0 +1,251 @@
+"""Content-addressed storage for message attachments.
+
+Uploads are read from the multipart spool in ``UPLOAD_CHUNK_SIZE`` chunks,
+hashed as they are copied into a temp file inside the store, and renamed to
+``objects/<sha256[:2]>/<sha256>``. When that object already exists the copy
+is discarded, so identical files are stored once however often they are
+shared. Starlette spools uploads to disk past 1 MB, so neither step holds a
+whole file in memory.
+
+Downloads are served by ``FileResponse`` (which handles ``Range`` requests)
+or, with ``ATTACHMENT_ACCEL_REDIRECT`` set, handed to nginx through
+``X-Accel-Redirect`` so the proxy sends the file with ``sendfile``.
+
+Image thumbnails are rendered by ``app.thumbnails`` on a process pool of
+``THUMBNAIL_WORKERS`` with at most ``THUMBNAIL_QUEUE_LIMIT`` renders in
+flight; uploads past that limit just go without a thumbnail. Thumbnails
+need Pillow and are skipped when it is not installed.
+
+Remove files no attachment references any more with
+``python -m app.attachments``.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO
+from urllib.parse import quote
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "./attachments")
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_QUEUE_LIMIT = int(os.getenv("THUMBNAIL_QUEUE_LIMIT", "32"))
+# e.g. "/protected-attachments", mapped in nginx to ATTACHMENT_DIR as internal.
+ATTACHMENT_ACCEL_REDIRECT = os.getenv("ATTACHMENT_ACCEL_REDIRECT")
+# Temp files and unreferenced objects younger than this may belong to an
+# upload whose row is not committed yet.
+GC_GRACE_SECONDS = 3600
+
+# Only these are rendered inline; everything else (HTML, SVG, ...) is sent
+# as a download so it cannot run script in the API's origin.
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+THUMBNAILS_ENABLED = THUMBNAIL_WORKERS > 0 and importlib.util.find_spec("PIL") is not None
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+def object_path(sha256: str) -> str:
+    return os.path.join(ATTACHMENT_DIR, "objects", sha256[:2], sha256)
+
+
+def thumbnail_path(sha256: str) -> str:
+    return os.path.join(ATTACHMENT_DIR, "thumbnails", sha256[:2], f"{sha256}.jpg")
+
+
+def clean_filename(filename: str | None) -> str:
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name[:255] or "file"
+
+
+def store_stream(source: BinaryIO) -> tuple[str, int]:
+    """Copy ``source`` into the store; return its sha256 and size."""
+    temp_dir = os.path.join(ATTACHMENT_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_ATTACHMENT_BYTES:
+                    raise AttachmentTooLarge()
+                digest.update(chunk)
+                target.write(chunk)
+        sha256 = digest.hexdigest()
+        destination = object_path(sha256)
+        try:
+            # A reused object gets a fresh mtime so a concurrent garbage
+            # collection, which only deletes files older than
+            # GC_GRACE_SECONDS, leaves it alone until the row is committed.
+            os.utime(destination)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(temp_path, destination)
+        else:
+            os.unlink(temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return sha256, size
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_pending: dict[str, Future] = {}
+_pending_lock = threading.Lock()
+_render_slots = threading.BoundedSemaphore(max(1, THUMBNAIL_QUEUE_LIMIT))
+
+
+def _thumbnail_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the API process runs threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _thumbnail_done(sha256: str, future: Future) -> None:
+    with _pending_lock:
+        _pending.pop(sha256, None)
+    _render_slots.release()
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("thumbnail for %s failed: %s", sha256, future.exception())
+
+
+def schedule_thumbnail(sha256: str, content_type: str) -> bool:
+    """Queue a thumbnail render; return whether one exists or is on its way."""
+    if not THUMBNAILS_ENABLED or content_type not in IMAGE_TYPES:
+        return False
+    destination = thumbnail_path(sha256)
+    if os.path.exists(destination):
+        return True
+
+    from .thumbnails import render_thumbnail
+
+    with _pending_lock:
+        if sha256 in _pending:
+            return True
+        if not _render_slots.acquire(blocking=False):
+            return False
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            future = _thumbnail_pool().submit(
+                render_thumbnail, object_path(sha256), destination, THUMBNAIL_SIZE
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool on the next upload.
+            _render_slots.release()
+            shutdown_thumbnail_pool()
+            return False
+        except Exception:
+            _render_slots.release()
+            raise
+        _pending[sha256] = future
+    future.add_done_callback(lambda done: _thumbnail_done(sha256, done))
+    return True
+
+
+def pending_thumbnail(sha256: str) -> Future | None:
+    with _pending_lock:
+        return _pending.get(sha256)
+
+
+def shutdown_thumbnail_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def file_response(path: str, media_type: str, filename: str) -> Response:
+    disposition = "inline" if media_type in IMAGE_TYPES else "attachment"
+    headers = {
+        # Objects are content-addressed, so a URL's bytes never change.
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if ATTACHMENT_ACCEL_REDIRECT:
+        relative = os.path.relpath(path, ATTACHMENT_DIR).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = f"{ATTACHMENT_ACCEL_REDIRECT.rstrip('/')}/{relative}"
+        headers["Content-Disposition"] = f"{disposition}; filename*=utf-8''{quote(filename)}"
+        return Response(media_type=media_type, headers=headers)
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        content_disposition_type=disposition,
+        headers=headers,
+    )
+
+
+def _stale_files(directory: str, older_than: float) -> Iterator[str]:
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) < older_than:
+                yield path
+
+
+def collect_garbage() -> dict[str, int]:
+    """Delete stored files that no attachment row references."""
+    db = SessionLocal()
+    try:
+        referenced = {sha256 for (sha256,) in db.query(models.Attachment.sha256).distinct()}
+    finally:
+        db.close()
+
+    older_than = time.time() - GC_GRACE_SECONDS
+    removed = {"objects": 0, "thumbnails": 0, "temp_files": 0}
+    for path in _stale_files(os.path.join(ATTACHMENT_DIR, "objects"), older_than):
+        if os.path.basename(path) not in referenced:
+            os.unlink(path)
+            removed["objects"] += 1
+    for path in _stale_files(os.path.join(ATTACHMENT_DIR, "thumbnails"), older_than):
+        if os.path.basename(path).split(".")[0] not in referenced:
+            os.unlink(path)
+            removed["thumbnails"] += 1
+    for path in _stale_files(os.path.join(ATTACHMENT_DIR, "tmp"), older_than):
+        os.unlink(path)
+        removed["temp_files"] += 1
+    return removed
+
+
+def main() -> None:
+    argparse.ArgumentParser(
+        description="Remove attachment files that no message references."
+    ).parse_args()
+    print(json.dumps(collect_garbage()))
+
+
+if __name__ == "__main__":
+    main()
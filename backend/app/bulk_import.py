@@ -0,0 +1,190 @@
+"""Bulk-load NDJSON message history, e.g. produced by the export endpoints.
+
+Each line is a JSON object with ``content`` and either ``sender_username``
+or ``user_id``; ``group_id``/``thread_id`` and ``created_at`` are optional
+when ``--scope-id`` is given. Rows are inserted with executemany batches
+in a single transaction, and ``--defer-indexes`` drops the table's secondary
+indexes for the load and rebuilds them once at the end. Only use that flag
+while the API is stopped.
+
+History is ordered by message id, so imported rows must get their ids in
+``created_at`` order and before any live message of the same scope. The
+importer therefore refuses a group or thread that already has messages (hot
+or archived) and input whose ``created_at`` goes backwards within a scope;
+either aborts the whole import. Import into a new group or thread before
+its members start posting; exports are already in the required order.
+
+    python -m app.bulk_import history.ndjson --kind group --scope-id 3
+    cat seed.ndjson | python -m app.bulk_import - --kind thread --defer-indexes
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .archive import ArchiveSegment, ArchiveSessionLocal
+from .database import SessionLocal
+
+# kind -> (hot model, scope column name)
+IMPORT_TARGETS = {
+    "group": (models.Message, "group_id"),
+    "thread": (models.DirectMessage, "thread_id"),
+}
+
+
+class ImportRejected(Exception):
+    pass
+
+
+def _scope_has_history(db: Session, kind: str, scope_id: int) -> bool:
+    model, column_name = IMPORT_TARGETS[kind]
+    if (
+        db.query(model.id).filter(getattr(model, column_name) == scope_id).first()
+        is not None
+    ):
+        return True
+    archive_db = ArchiveSessionLocal()
+    try:
+        return (
+            archive_db.query(ArchiveSegment.id)
+            .filter(ArchiveSegment.kind == kind, ArchiveSegment.scope_id == scope_id)
+            .first()
+            is not None
+        )
+    finally:
+        archive_db.close()
+
+
+def _parse_created_at(value) -> datetime:
+    if not value:
+        return datetime.utcnow()
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def import_messages(
+    db: Session,
+    kind: str,
+    lines: Iterable[str | bytes],
+    scope_id: int | None = None,
+    batch_size: int = 5000,
+) -> dict[str, int]:
+    model, column_name = IMPORT_TARGETS[kind]
+    user_ids = dict(db.query(models.User.username, models.User.id).all())
+    known_ids = set(user_ids.values())
+
+    stats = {"imported": 0, "skipped": 0}
+    batch: list[dict] = []
+    # scope id -> created_at of the last row queued for it
+    latest: dict[int, datetime] = {}
+
+    def flush() -> None:
+        if batch:
+            db.execute(insert(model), batch)
+            stats["imported"] += len(batch)
+            batch.clear()
+
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            user_id = user_ids.get(record.get("sender_username"))
+            if user_id is None and record.get("user_id") in known_ids:
+                user_id = record["user_id"]
+            target_scope = scope_id if scope_id is not None else record.get(column_name)
+            if user_id is None or target_scope is None or not record.get("content"):
+                stats["skipped"] += 1
+                continue
+
+            created_at = _parse_created_at(record.get("created_at"))
+            previous = latest.get(target_scope)
+            if previous is None:
+                if _scope_has_history(db, kind, target_scope):
+                    raise ImportRejected(
+                        f"{kind} {target_scope} already has messages; "
+                        "import only into an empty group or thread"
+                    )
+            elif created_at < previous:
+                raise ImportRejected(
+                    f"created_at goes backwards in {kind} {target_scope} "
+                    f"({created_at.isoformat()} after {previous.isoformat()}); "
+                    "sort the input by created_at"
+                )
+            latest[target_scope] = created_at
+
+            batch.append(
+                {
+                    column_name: target_scope,
+                    "user_id": user_id,
+                    "content": record["content"],
+                    "created_at": created_at,
+                }
+            )
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        # All or nothing: a rejected import leaves no partial history behind.
+        db.rollback()
+        raise
+    db.commit()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-import NDJSON message history.")
+    parser.add_argument("path", help="NDJSON file, or - for stdin")
+    parser.add_argument("--kind", choices=sorted(IMPORT_TARGETS), default="group")
+    parser.add_argument("--scope-id", type=int, help="Target group or DM thread id")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="Drop secondary indexes during the load and rebuild them afterwards",
+    )
+    args = parser.parse_args()
+
+    model, _ = IMPORT_TARGETS[args.kind]
+    indexes = list(model.__table__.indexes) if args.defer_indexes else []
+
+    db = SessionLocal()
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        if args.defer_indexes and db.get_bind().dialect.name == "sqlite":
+            db.execute(text("PRAGMA synchronous = OFF"))
+        for index in indexes:
+            index.drop(bind=db.connection(), checkfirst=True)
+        db.commit()
+        try:
+            stats = import_messages(
+                db,
+                args.kind,
+                source,
+                scope_id=args.scope_id,
+                batch_size=args.batch_size,
+            )
+        except ImportRejected as exc:
+            parser.exit(1, f"import rejected, nothing was written: {exc}\n")
+        finally:
+            for index in indexes:
+                index.create(bind=db.connection(), checkfirst=True)
+            db.commit()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        db.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Registry of open WebSockets, keyed by topic and by user.
+
+A topic is ``("group", group_id)`` or ``("thread", thread_id)``, the same
+scope keys used by presence, the rate limiter and the message cache. Each
+socket is one slotted ``Connection`` holding the socket and plain ids; the
+handlers keep no ORM objects or database sessions alive while a socket sits
+idle. The user index lets events reach one user's sockets, or close them,
+without scanning every topic.
+
+All state is touched from the event loop only, so there is no locking.
+"""
+
+import json
+import time
+from collections.abc import Iterator
+
+from fastapi import WebSocket
+
+from . import metrics
+
+Topic = tuple[str, int]
+# Metric label per topic kind, as used before the registry existed.
+_METRIC_LABELS = {"group": "group", "thread": "dm"}
+
+
+class Connection:
+    __slots__ = ("websocket", "user_id", "kind", "scope_id")
+
+    def __init__(self, websocket: WebSocket, user_id: int, kind: str, scope_id: int) -> None:
+        self.websocket = websocket
+        self.user_id = user_id
+        self.kind = kind
+        self.scope_id = scope_id
+
+    @property
+    def topic(self) -> Topic:
+        return (self.kind, self.scope_id)
+
+
+def encode_event(payload: dict) -> str:
+    # Same encoding as WebSocket.send_json, done once per event.
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+class ConnectionRegistry:
+    def __init__(self) -> None:
+        self._topics: dict[Topic, set[Connection]] = {}
+        # A user rarely holds more than a few sockets, so a list is both
+        # smaller than a set and quick enough to search.
+        self._users: dict[int, list[Connection]] = {}
+
+    async def connect(self, websocket: WebSocket, user_id: int, topic: Topic) -> Connection:
+        await websocket.accept()
+        return self.add(Connection(websocket, user_id, *topic))
+
+    def add(self, connection: Connection) -> Connection:
+        self._topics.setdefault(connection.topic, set()).add(connection)
+        self._users.setdefault(connection.user_id, []).append(connection)
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        """Forget ``connection``; safe to call more than once."""
+        topic = connection.topic
+        connections = self._topics.get(topic)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._topics[topic]
+        user_connections = self._users.get(connection.user_id)
+        if user_connections is not None and connection in user_connections:
+            user_connections.remove(connection)
+            if not user_connections:
+                del self._users[connection.user_id]
+
+    def user_connections(self, user_id: int, topic: Topic | None = None) -> list[Connection]:
+        return [
+            connection
+            for connection in self._users.get(user_id, ())
+            if topic is None or connection.topic == topic
+        ]
+
+    def topic_sizes(self) -> Iterator[tuple[Topic, int]]:
+        for topic, connections in list(self._topics.items()):
+            yield topic, len(connections)
+
+    async def _send(self, connections: list[Connection], text: str) -> int:
+        dead = []
+        for connection in connections:
+            try:
+                await connection.websocket.send_text(text)
+            except Exception:
+                dead.append(connection)
+        for connection in dead:
+            self.disconnect(connection)
+        return len(dead)
+
+    async def broadcast(self, topic: Topic, payload: dict) -> None:
+        connections = self._topics.get(topic)
+        if not connections:
+            return
+
+        started = time.perf_counter()
+        # Copy so sockets may come and go while sends are awaited.
+        failed = await self._send(list(connections), encode_event(payload))
+        label = _METRIC_LABELS[topic[0]]
+        metrics.broadcast_duration.observe(label, value=time.perf_counter() - started)
+        if failed:
+            metrics.broadcast_failed_sends.inc(label, value=failed)
+
+    async def send_to_user(self, user_id: int, payload: dict) -> None:
+        connections = self.user_connections(user_id)
+        if connections:
+            await self._send(connections, encode_event(payload))
+
+    async def _close(self, connections: list[Connection], code: int, reason: str) -> int:
+        for connection in connections:
+            self.disconnect(connection)
+            try:
+                await connection.websocket.close(code=code, reason=reason)
+            except Exception:
+                pass
+        return len(connections)
+
+    async def close_user(
+        self, user_id: int, topic: Topic | None = None, code: int = 1008, reason: str = ""
+    ) -> int:
+        """Close ``user_id``'s sockets (on ``topic`` only, if given); return how many."""
+        return await self._close(self.user_connections(user_id, topic), code, reason)
+
+    async def close_topic(self, topic: Topic, code: int = 1008, reason: str = "") -> int:
+        return await self._close(list(self._topics.get(topic, ())), code, reason)
+
+
+sockets = ConnectionRegistry()
@@ -1,7 +1,15 @@
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from datetime import datetime
+
+from sqlalchemy import and_, or_, tuple_, update
+from sqlalchemy.orm import Session, joinedload
 
 from . import auth, models, schemas
+from .database import SessionLocal, engine
+from .events import GroupDeleted, MemberBanned, MemberJoined, MemberUnbanned, event_bus
+from .membership_cache import membership_cache
+from .message_cache import message_cache
+from .user_index import user_index
+from .versions import versions
 
 
 def get_user_by_email(db: Session, email: str):
@@ -27,6 +35,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_index.upsert(db_user.id, db_user.username, db_user.full_name)
     return db_user
 
 
@@ -46,14 +55,17 @@ def create_admin_user(db: Session, username: str, email: str, password: str):
     db.add(admin_user)
     db.commit()
     db.refresh(admin_user)
+    user_index.upsert(admin_user.id, admin_user.username, admin_user.full_name)
     return admin_user
 
 
 def create_group(db: Session, group: schemas.GroupCreate, user_id: int):
     db_group = models.Group(
         name=group.name,
+        name_key=group_name_key(group.name),
         description=group.description,
         created_by=user_id,
+        member_count=1,
     )
     db.add(db_group)
     db.commit()
@@ -62,54 +74,128 @@ def create_group(db: Session, group: schemas.GroupCreate, user_id: int):
     membership = models.GroupMember(group_id=db_group.id, user_id=user_id, role="owner")
     db.add(membership)
     db.commit()
+    versions.bump(("groups",), ("memberships", user_id), ("members", db_group.id))
+    event_bus.publish(MemberJoined(db_group.id, user_id))
 
     return db_group
 
 
+def _adjust_member_count(db: Session, group_id: int, delta: int) -> None:
+    db.execute(
+        update(models.Group)
+        .where(models.Group.id == group_id)
+        .values(member_count=models.Group.member_count + delta)
+    )
+
+
+def get_group(db: Session, group_id: int):
+    return (
+        db.query(models.Group)
+        .filter(models.Group.id == group_id, models.Group.deleted_at.is_(None))
+        .first()
+    )
+
+
 def list_groups(db: Session, user_id: int):
     return (
         db.query(models.Group)
         .join(models.GroupMember)
-        .filter(models.GroupMember.user_id == user_id)
+        .filter(models.GroupMember.user_id == user_id, models.Group.deleted_at.is_(None))
         .all()
     )
 
 
-def list_all_groups(db: Session):
-    return db.query(models.Group).all()
+def group_name_key(name: str) -> str:
+    return name.lower()
 
 
-def get_member_group_ids(db: Session, user_id: int):
-    return {
-        membership.group_id
-        for membership in db.query(models.GroupMember)
-        .filter(models.GroupMember.user_id == user_id)
-        .all()
-    }
+def list_all_groups(
+    db: Session,
+    user_id: int,
+    prefix: str | None = None,
+    after: tuple[str, int] | None = None,
+    limit: int | None = None,
+):
+    """Return ``(group, is_member)`` rows ordered by lowercased name.
+
+    Membership is resolved by an outer join in the same query. The prefix
+    match is case-insensitive and written as a range over ``name_key`` so it
+    can walk that column's index; ``after`` is a ``(name_key, id)`` cursor.
+    """
+    query = db.query(
+        models.Group,
+        models.GroupMember.id.is_not(None).label("is_member"),
+    ).outerjoin(
+        models.GroupMember,
+        and_(
+            models.GroupMember.group_id == models.Group.id,
+            models.GroupMember.user_id == user_id,
+        ),
+    ).filter(models.Group.deleted_at.is_(None))
+    if prefix:
+        key = group_name_key(prefix)
+        query = query.filter(
+            models.Group.name_key >= key,
+            models.Group.name_key < key + "\U0010ffff",
+        )
+    if after is not None:
+        query = query.filter(tuple_(models.Group.name_key, models.Group.id) > after)
+    query = query.order_by(models.Group.name_key.asc(), models.Group.id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
 def get_membership(db: Session, group_id: int, user_id: int):
     return (
         db.query(models.GroupMember)
+        .join(models.Group, models.Group.id == models.GroupMember.group_id)
         .filter(
             models.GroupMember.group_id == group_id,
             models.GroupMember.user_id == user_id,
+            models.Group.deleted_at.is_(None),
         )
         .first()
     )
 
 
-def is_member(db: Session, group_id: int, user_id: int) -> bool:
-    return (
-        db.query(models.GroupMember)
+def get_primary_membership(db: Session, group_id: int, user_id: int):
+    """``get_membership`` read from the primary, even when ``db`` is a replica.
+
+    Authorization must not trust a replica, which may not have seen a ban yet.
+    """
+    if db.get_bind() is engine:
+        return get_membership(db, group_id, user_id)
+    primary = SessionLocal()
+    try:
+        return get_membership(primary, group_id, user_id)
+    finally:
+        primary.close()
+
+
+def list_member_group_ids(db: Session, user_id: int) -> list[int]:
+    return [
+        group_id
+        for (group_id,) in db.query(models.GroupMember.group_id)
+        .join(models.Group, models.Group.id == models.GroupMember.group_id)
         .filter(
-            models.GroupMember.group_id == group_id,
             models.GroupMember.user_id == user_id,
             models.GroupMember.is_banned.is_(False),
+            models.Group.deleted_at.is_(None),
         )
-        .first()
-        is not None
-    )
+        .all()
+    ]
+
+
+def is_member(db: Session, group_id: int, user_id: int) -> bool:
+    allowed = membership_cache.get(group_id, user_id)
+    if allowed is not None:
+        return allowed
+    token = membership_cache.fill_token()
+    membership = get_primary_membership(db, group_id, user_id)
+    allowed = membership is not None and not membership.is_banned
+    membership_cache.fill(group_id, user_id, allowed, token)
+    return allowed
 
 
 def add_member(db: Session, group_id: int, user_id: int):
@@ -127,67 +213,125 @@ def add_member(db: Session, group_id: int, user_id: int):
 
     membership = models.GroupMember(group_id=group_id, user_id=user_id, role="member")
     db.add(membership)
+    _adjust_member_count(db, group_id, 1)
     db.commit()
+    versions.bump(("groups",), ("memberships", user_id), ("members", group_id))
+    event_bus.publish(MemberJoined(group_id, user_id))
     db.refresh(membership)
     return membership
 
 
-def list_group_members(db: Session, group_id: int):
-    return (
-        db.query(models.GroupMember)
-        .join(models.User)
+def list_group_members(
+    db: Session,
+    group_id: int,
+    role: str | None = None,
+    is_banned: bool | None = None,
+    search: str | None = None,
+    after_user_id: int | None = None,
+    limit: int | None = None,
+):
+    """Return member rows ordered by user id, walking the (group_id, user_id) index.
+
+    ``search`` keeps members whose username or full name starts with it,
+    ignoring case; it filters the group's rows rather than using an index.
+    """
+    query = (
+        db.query(
+            models.GroupMember.user_id,
+            models.User.username,
+            models.User.full_name,
+            models.GroupMember.role,
+            models.GroupMember.is_banned,
+            models.GroupMember.joined_at,
+        )
+        .join(models.User, models.User.id == models.GroupMember.user_id)
         .filter(models.GroupMember.group_id == group_id)
-        .all()
     )
+    if role is not None:
+        query = query.filter(models.GroupMember.role == role)
+    if is_banned is not None:
+        query = query.filter(models.GroupMember.is_banned.is_(is_banned))
+    if search:
+        query = query.filter(
+            or_(
+                models.User.username.istartswith(search, autoescape=True),
+                models.User.full_name.istartswith(search, autoescape=True),
+            )
+        )
+    if after_user_id is not None:
+        query = query.filter(models.GroupMember.user_id > after_user_id)
+    query = query.order_by(models.GroupMember.user_id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
-def ban_member(db: Session, group_id: int, user_id: int):
-    membership = (
-        db.query(models.GroupMember)
-        .filter(
-            models.GroupMember.group_id == group_id,
-            models.GroupMember.user_id == user_id,
-        )
-        .first()
+def get_member_count(db: Session, group_id: int):
+    return (
+        db.query(models.Group.member_count)
+        .filter(models.Group.id == group_id)
+        .scalar()
     )
+
+
+def ban_member(db: Session, group_id: int, user_id: int):
+    membership = get_membership(db, group_id, user_id)
     if not membership:
         return None
-    membership.is_banned = True
+    if not membership.is_banned:
+        membership.is_banned = True
+        _adjust_member_count(db, group_id, -1)
     db.commit()
+    versions.bump(("groups",), ("memberships", user_id), ("members", group_id))
+    event_bus.publish(MemberBanned(group_id, user_id))
     db.refresh(membership)
     return membership
 
 
 def unban_member(db: Session, group_id: int, user_id: int):
-    membership = (
-        db.query(models.GroupMember)
-        .filter(
-            models.GroupMember.group_id == group_id,
-            models.GroupMember.user_id == user_id,
-        )
-        .first()
-    )
+    membership = get_membership(db, group_id, user_id)
     if not membership:
         return None
-    membership.is_banned = False
+    if membership.is_banned:
+        membership.is_banned = False
+        _adjust_member_count(db, group_id, 1)
     db.commit()
+    versions.bump(("groups",), ("memberships", user_id), ("members", group_id))
+    event_bus.publish(MemberUnbanned(group_id, user_id))
     db.refresh(membership)
     return membership
 
 
-def add_message(db: Session, group_id: int, user_id: int, message: schemas.MessageCreate):
+def add_message(
+    db: Session,
+    group_id: int,
+    user_id: int,
+    message: schemas.MessageCreate,
+    attachment: models.Attachment | None = None,
+):
     db_message = models.Message(
         group_id=group_id,
         user_id=user_id,
         content=message.content,
+        attachment=attachment,
     )
     db.add(db_message)
     db.commit()
     db.refresh(db_message)
+    message_cache.append(("group", group_id), db_message.id, encode_message(db_message))
     return db_message
 
 
+def encode_message(message: models.Message) -> bytes:
+    return schemas.MessageRead.model_validate(message).model_dump_json().encode()
+
+
+def encode_direct_message(message: models.DirectMessage) -> bytes:
+    return schemas.DirectMessageRead.model_validate(message).model_dump_json().encode()
+
+
 def update_user(db: Session, user: models.User, data: schemas.UserUpdate):
+    previous_names = (user.username, user.full_name)
     if "full_name" in data.__fields_set__:
         user.full_name = data.full_name
     if "username" in data.__fields_set__ and data.username is not None:
@@ -199,44 +343,99 @@ def update_user(db: Session, user: models.User, data: schemas.UserUpdate):
 
     db.commit()
     db.refresh(user)
+    user_index.upsert(user.id, user.username, user.full_name)
+    if (user.username, user.full_name) != previous_names:
+        # Cached messages embed sender names.
+        message_cache.clear()
+        versions.bump(("users",), ("user", user.id))
     return user
 
 
 def update_group(db: Session, group_id: int, name: str, description: str | None):
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+    group = get_group(db, group_id)
     if not group:
         return None
 
     group.name = name
+    group.name_key = group_name_key(name)
     group.description = description
     db.commit()
+    versions.bump(("groups",))
     db.refresh(group)
     return group
 
 
-def delete_group(db: Session, group_id: int):
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+def mark_group_deleted(db: Session, group_id: int):
+    """Hide a group and queue its rows for chunked removal."""
+    group = get_group(db, group_id)
     if not group:
         return None
 
-    db.query(models.Message).filter(models.Message.group_id == group_id).delete(
-        synchronize_session=False
-    )
-    db.query(models.GroupMember).filter(models.GroupMember.group_id == group_id).delete(
-        synchronize_session=False
-    )
-    db.delete(group)
+    group.deleted_at = datetime.utcnow()
+    job = models.GroupDeletionJob(group_id=group_id, status="pending")
+    db.add(job)
     db.commit()
-    return group
+    db.refresh(job)
+    message_cache.invalidate(("group", group_id))
+    versions.bump(("groups",), ("members", group_id))
+    event_bus.publish(GroupDeleted(group_id))
+    return job
 
 
-def list_messages(db: Session, group_id: int):
+def get_group_deletion_job(db: Session, group_id: int):
     return (
+        db.query(models.GroupDeletionJob)
+        .filter(models.GroupDeletionJob.group_id == group_id)
+        .first()
+    )
+
+
+def list_unfinished_deletion_jobs(db: Session):
+    return (
+        db.query(models.GroupDeletionJob)
+        .filter(models.GroupDeletionJob.status.in_(("pending", "running", "failed")))
+        .order_by(models.GroupDeletionJob.id.asc())
+        .all()
+    )
+
+
+def delete_group_rows_chunk(db: Session, model, group_id: int, chunk_size: int) -> int:
+    """Delete up to ``chunk_size`` rows of ``model`` belonging to a group.
+
+    The caller commits, so each chunk is its own short write transaction.
+    """
+    ids = [
+        row_id
+        for (row_id,) in db.query(model.id)
+        .filter(model.group_id == group_id)
+        .limit(chunk_size)
+        .all()
+    ]
+    if not ids:
+        return 0
+    db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+    return len(ids)
+
+
+def list_messages(
+    db: Session,
+    group_id: int,
+    before_id: int | None = None,
+    limit: int | None = None,
+):
+    """Return up to ``limit`` messages older than ``before_id``, oldest first."""
+    query = (
         db.query(models.Message)
+        .options(joinedload(models.Message.user), joinedload(models.Message.attachment))
         .filter(models.Message.group_id == group_id)
-        .order_by(models.Message.created_at.asc())
-        .all()
     )
+    if before_id is not None:
+        query = query.filter(models.Message.id < before_id)
+    if limit is None:
+        return query.order_by(models.Message.id.asc()).all()
+    messages = query.order_by(models.Message.id.desc()).limit(limit).all()
+    messages.reverse()
+    return messages
 
 
 def get_direct_thread(db: Session, user_a_id: int, user_b_id: int):
@@ -264,13 +463,33 @@ def get_or_create_direct_thread(db: Session, user_a_id: int, user_b_id: int):
     return thread
 
 
-def list_direct_messages(db: Session, thread_id: int):
-    return (
+def is_thread_participant(db: Session, thread_id: int, user_id: int) -> bool:
+    thread = db.get(models.DirectThread, thread_id)
+    return thread is not None and user_id in (thread.user_a_id, thread.user_b_id)
+
+
+def get_attachment(db: Session, attachment_id: int):
+    return db.get(models.Attachment, attachment_id)
+
+
+def list_direct_messages(
+    db: Session,
+    thread_id: int,
+    before_id: int | None = None,
+    limit: int | None = None,
+):
+    query = (
         db.query(models.DirectMessage)
+        .options(joinedload(models.DirectMessage.user), joinedload(models.DirectMessage.attachment))
         .filter(models.DirectMessage.thread_id == thread_id)
-        .order_by(models.DirectMessage.created_at.asc())
-        .all()
     )
+    if before_id is not None:
+        query = query.filter(models.DirectMessage.id < before_id)
+    if limit is None:
+        return query.order_by(models.DirectMessage.id.asc()).all()
+    messages = query.order_by(models.DirectMessage.id.desc()).limit(limit).all()
+    messages.reverse()
+    return messages
 
 
 def add_direct_message(
@@ -278,15 +497,22 @@ def add_direct_message(
     thread_id: int,
     user_id: int,
     message: schemas.DirectMessageCreate,
+    attachment: models.Attachment | None = None,
 ):
     db_message = models.DirectMessage(
         thread_id=thread_id,
         user_id=user_id,
         content=message.content,
+        attachment=attachment,
     )
     db.add(db_message)
     db.commit()
     db.refresh(db_message)
+    message_cache.append(
+        ("thread", thread_id), db_message.id, encode_direct_message(db_message)
+    )
+    thread = db_message.thread
+    versions.bump(("dm_peers", thread.user_a_id), ("dm_peers", thread.user_b_id))
     return db_message
 
 
@@ -1,16 +1,92 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-DATABASE_URL = "sqlite:///./app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# A replica (or, for SQLite, a read-only connection such as
+# "sqlite:///file:app.db?mode=ro&uri=true") that serves list endpoints.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "10"))
+# How long after writing a user keeps reading from the primary; should
+# cover the replica's usual lag.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# How long a SQLite writer waits for the write lock before failing with
+# "database is locked". Shared with migrations, which can hold the lock for
+# a whole index build.
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "30"))
+
+
+def connect_args_for(url: str) -> dict:
+    """Driver arguments for ``url``; the SQLite ones are rejected by other drivers."""
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_SECONDS}
+    return {}
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args_for(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+READ_REPLICA = bool(READ_DATABASE_URL)
+if READ_REPLICA:
+    read_engine = create_engine(
+        READ_DATABASE_URL,
+        connect_args=connect_args_for(READ_DATABASE_URL),
+        pool_size=READ_POOL_SIZE,
+        max_overflow=READ_POOL_SIZE,
+    )
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
+_recent_writers: dict[str, float] = {}
+_recent_writers_lock = threading.Lock()
+
+
+def mark_recent_writer(username: str) -> None:
+    """Route ``username``'s reads to the primary for the next few seconds."""
+    now = time.monotonic()
+    with _recent_writers_lock:
+        if len(_recent_writers) > 10_000:
+            for name in [name for name, until in _recent_writers.items() if until <= now]:
+                del _recent_writers[name]
+        _recent_writers[username] = now + READ_YOUR_WRITES_SECONDS
+
+
+def wrote_recently(username: str | None) -> bool:
+    if username is None:
+        return False
+    until = _recent_writers.get(username)
+    return until is not None and until > time.monotonic()
+
+
+# Writer sessions note that they changed something; callers that know who is
+# writing put the username in ``session.info`` so the commit can mark them.
+@event.listens_for(SessionLocal, "after_flush")
+def _note_flush(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _note_bulk_write(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writer(session) -> None:
+    if session.info.pop("wrote", False) and session.info.get("username"):
+        mark_recent_writer(session.info["username"])
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_write(session, previous_transaction) -> None:
+    session.info.pop("wrote", None)
+
 
 def get_db():
     db = SessionLocal()
@@ -18,3 +94,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def read_session_for(username: str | None):
+    """A replica session, or a primary one while ``username`` has fresh writes."""
+    if READ_REPLICA and not wrote_recently(username):
+        return ReadSessionLocal()
+    return SessionLocal()
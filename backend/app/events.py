@@ -0,0 +1,75 @@
+"""In-process bus for membership control events.
+
+``crud`` publishes after committing a ban, unban, join or group deletion.
+Plain subscribers run inline in the publishing thread, so caches are
+invalidated before the request that made the change returns. Async
+subscribers are scheduled on the API's event loop once ``bind`` has been
+called, because sockets are only touched from the loop. Like the version
+counters, events only reach the process that published them.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemberJoined(NamedTuple):
+    group_id: int
+    user_id: int
+
+
+class MemberBanned(NamedTuple):
+    group_id: int
+    user_id: int
+
+
+class MemberUnbanned(NamedTuple):
+    group_id: int
+    user_id: int
+
+
+class GroupDeleted(NamedTuple):
+    group_id: int
+
+
+def _log_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Event handler failed", exc_info=future.exception())
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._handlers: dict[type, list[Callable[[object], None]]] = {}
+        self._async_handlers: dict[type, list[Callable[[object], Awaitable[None]]]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, event_type: type, handler: Callable) -> None:
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def subscribe_async(self, event_type: type, handler: Callable) -> None:
+        self._async_handlers.setdefault(event_type, []).append(handler)
+
+    def bind(self, loop: asyncio.AbstractEventLoop | None) -> None:
+        self._loop = loop
+
+    def publish(self, event: NamedTuple) -> None:
+        for handler in self._handlers.get(type(event), ()):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed for %r", event)
+
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        for handler in self._async_handlers.get(type(event), ()):
+            # Safe from worker threads and from the loop itself.
+            future = asyncio.run_coroutine_threadsafe(handler(event), loop)
+            future.add_done_callback(_log_failure)
+
+
+event_bus = EventBus()
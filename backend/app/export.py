@@ -0,0 +1,71 @@
+import json
+from collections.abc import Iterator
+
+from sqlalchemy import select
+
+from . import models, schemas
+from .archive import iter_archived
+from .database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+# kind -> (hot model, scope column name)
+EXPORT_SOURCES = {
+    "group": (models.Message, "group_id"),
+    "thread": (models.DirectMessage, "thread_id"),
+}
+
+
+def iter_history_ndjson(kind: str, scope_id: int) -> Iterator[bytes]:
+    """Yield a group's or DM thread's full history as NDJSON, oldest first.
+
+    Archived segments are replayed first, then the hot table is read through
+    a streaming cursor in ``EXPORT_BATCH_SIZE`` row batches, so memory stays
+    flat regardless of history length. Runs on its own session because the
+    response outlives the request's ``get_db`` session.
+    """
+    last_archived_id = 0
+    for message_id, line in iter_archived(kind, scope_id):
+        last_archived_id = message_id
+        yield line + b"\n"
+
+    model, column_name = EXPORT_SOURCES[kind]
+    statement = (
+        select(
+            model.id,
+            getattr(model, column_name),
+            model.user_id,
+            models.User.username,
+            models.User.full_name,
+            model.content,
+            model.created_at,
+            models.Attachment,
+        )
+        .join(models.User, models.User.id == model.user_id)
+        .outerjoin(models.Attachment, models.Attachment.id == model.attachment_id)
+        .where(getattr(model, column_name) == scope_id, model.id > last_archived_id)
+        .order_by(model.id.asc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    db = SessionLocal()
+    try:
+        for row in db.execute(statement):
+            message_id, scope, user_id, username, full_name, content, created_at, attachment = row
+            record = {
+                "id": message_id,
+                column_name: scope,
+                "user_id": user_id,
+                "sender_username": username,
+                "sender_name": full_name or username,
+                "content": content,
+                "attachment": (
+                    schemas.AttachmentRead.model_validate(attachment).model_dump()
+                    if attachment is not None
+                    else None
+                ),
+                "created_at": created_at.isoformat(),
+            }
+            yield json.dumps(record, separators=(",", ":")).encode() + b"\n"
+    finally:
+        db.close()
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from . import crud, models
+from .archive import delete_archived_scope
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = int(os.getenv("GROUP_DELETE_CHUNK_SIZE", "2000"))
+# Pause between chunks so other writers can take the SQLite write lock.
+DELETE_CHUNK_PAUSE = float(os.getenv("GROUP_DELETE_CHUNK_PAUSE", "0.01"))
+
+_running: set[int] = set()
+_running_lock = threading.Lock()
+
+
+def run_deletion_job(job_id: int) -> None:
+    """Remove a hidden group's messages, memberships and row in bounded chunks.
+
+    Progress is committed with every chunk, so a job interrupted by a crash
+    picks up where it stopped when ``resume_deletion_jobs`` runs it again.
+    """
+    with _running_lock:
+        if job_id in _running:
+            return
+        _running.add(job_id)
+
+    db = SessionLocal()
+    try:
+        job = db.get(models.GroupDeletionJob, job_id)
+        if job is None or job.status == "done":
+            return
+        job.status = "running"
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+        # Messages go before the attachments they reference. Stored files
+        # are shared by hash and left to ``python -m app.attachments``.
+        for model, counter in (
+            (models.Message, "messages_deleted"),
+            (models.Attachment, None),
+            (models.GroupMember, "members_deleted"),
+        ):
+            while True:
+                deleted = crud.delete_group_rows_chunk(
+                    db, model, job.group_id, DELETE_CHUNK_SIZE
+                )
+                if not deleted:
+                    break
+                if counter:
+                    setattr(job, counter, getattr(job, counter) + deleted)
+                job.updated_at = datetime.utcnow()
+                db.commit()
+                if DELETE_CHUNK_PAUSE:
+                    time.sleep(DELETE_CHUNK_PAUSE)
+
+        delete_archived_scope("group", job.group_id)
+        db.query(models.Group).filter(models.Group.id == job.group_id).delete(
+            synchronize_session=False
+        )
+        job.status = "done"
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Group deletion job %s failed", job_id)
+        job = db.get(models.GroupDeletionJob, job_id)
+        if job is not None:
+            job.status = "failed"
+            job.error = str(exc)[:1000]
+            job.updated_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        with _running_lock:
+            _running.discard(job_id)
+
+
+def _run_jobs(job_ids: list[int]) -> None:
+    for job_id in job_ids:
+        run_deletion_job(job_id)
+
+
+def start_deletion_job(job_id: int) -> None:
+    """Run a new job on its own thread, off the request threadpool."""
+    thread = threading.Thread(
+        target=run_deletion_job,
+        args=(job_id,),
+        name=f"group-deletion-{job_id}",
+        daemon=True,
+    )
+    thread.start()
+
+
+def resume_deletion_jobs() -> None:
+    """Restart unfinished or failed jobs on a background thread."""
+    db = SessionLocal()
+    try:
+        job_ids = [job.id for job in crud.list_unfinished_deletion_jobs(db)]
+    finally:
+        db.close()
+
+    if job_ids:
+        thread = threading.Thread(
+            target=_run_jobs,
+            args=(job_ids,),
+            name="group-deletion-resume",
+            daemon=True,
+        )
+        thread.start()
@@ -1,24 +1,57 @@
+import asyncio
+import json
 import os
-from typing import Dict, Set
+from functools import partial
+from typing import Callable
 
 from fastapi import (
     BackgroundTasks,
     Depends,
     FastAPI,
+    File,
+    Form,
     HTTPException,
     Query,
+    Request,
+    Response,
     WebSocket,
     WebSocketDisconnect,
+    UploadFile,
     status,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from . import auth, crud, models, schemas
-from .database import Base, SessionLocal, engine, get_db
-
-Base.metadata.create_all(bind=engine)
+import anyio.to_thread
+
+from . import attachments, auth, crud, metrics, models, profiling, schemas
+from .archive import read_archived, start_retention_worker
+from .connections import sockets
+from .events import GroupDeleted, MemberBanned, MemberJoined, MemberUnbanned, event_bus
+from .database import (
+    READ_REPLICA,
+    READ_YOUR_WRITES_SECONDS,
+    SessionLocal,
+    engine,
+    get_db,
+    mark_recent_writer,
+    read_engine,
+    read_session_for,
+)
+from .export import iter_history_ndjson
+from .group_deletion import resume_deletion_jobs, start_deletion_job
+from .membership_cache import membership_cache
+from .message_cache import encode_message_list, message_cache
+from .migrate import check_schema
+from .pagination import decode_cursor, encode_cursor
+from .presence import presence
+from .rate_limit import message_retry_after, retry_after_header
+from .user_index import user_index
+from .versions import versions
 
 app = FastAPI(title="Online Chat API")
 
@@ -28,12 +61,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if READ_REPLICA:
+    metrics.instrument_engine(read_engine)
+if profiling.SQL_PROFILE:
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.SQLProfilingMiddleware)
+    profiling.instrument_engine(engine)
+    if READ_REPLICA:
+        profiling.instrument_engine(read_engine)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 DEFAULT_ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 DEFAULT_ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@example.com")
 DEFAULT_ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin12345")
+MESSAGE_PAGE_SIZE = 50
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+@app.on_event("startup")
+def require_single_worker():
+    # The message and membership caches, ETag versions, presence and socket
+    # fan-out all live in this process and are invalidated in-process only;
+    # a second worker would serve bans, deletions and edits late.
+    if WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY is {WEB_CONCURRENCY}, but the API keeps its caches "
+            "in process and must run as a single worker."
+        )
+
+
+@app.on_event("startup")
+def verify_schema():
+    check_schema()
 
 
 @app.on_event("startup")
@@ -46,79 +108,216 @@ def create_default_admin():
             email=DEFAULT_ADMIN_EMAIL,
             password=DEFAULT_ADMIN_PASSWORD,
         )
+        user_index.load(db)
     finally:
         db.close()
+    resume_deletion_jobs()
+    start_retention_worker()
 
 
-class ConnectionManager:
-    def __init__(self) -> None:
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
+@app.on_event("startup")
+async def start_presence_flusher():
+    app.state.presence_task = asyncio.create_task(presence.run(sockets.broadcast))
 
-    async def connect(self, group_id: int, websocket: WebSocket) -> None:
-        await websocket.accept()
-        self.active_connections.setdefault(group_id, set()).add(websocket)
 
-    def disconnect(self, group_id: int, websocket: WebSocket) -> None:
-        if group_id in self.active_connections:
-            self.active_connections[group_id].discard(websocket)
-            if not self.active_connections[group_id]:
-                del self.active_connections[group_id]
+@app.on_event("shutdown")
+async def stop_presence_flusher():
+    task = getattr(app.state, "presence_task", None)
+    if task is not None:
+        task.cancel()
 
-    async def broadcast(self, group_id: int, payload: dict) -> None:
-        if group_id not in self.active_connections:
-            return
-        
-        dead_connections = []
-        # Create a list to iterate over to avoid "Set size changed during iteration"
-        for websocket in list(self.active_connections[group_id]):
-            try:
-                await websocket.send_json(payload)
-            except Exception:
-                dead_connections.append(websocket)
-        
-        for websocket in dead_connections:
-            self.disconnect(group_id, websocket)
 
+async def evict_banned_member(event: MemberBanned) -> None:
+    topic = ("group", event.group_id)
+    presence.leave_group(event.user_id, event.group_id)
+    await sockets.close_user(event.user_id, topic, reason="Banned from this group")
 
-manager = ConnectionManager()
 
+async def announce_member(event: MemberJoined | MemberUnbanned) -> None:
+    presence.join_group(event.user_id, event.group_id)
 
-class DirectConnectionManager:
-    def __init__(self) -> None:
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
 
-    async def connect(self, thread_id: int, websocket: WebSocket) -> None:
-        await websocket.accept()
-        self.active_connections.setdefault(thread_id, set()).add(websocket)
+async def close_deleted_group(event: GroupDeleted) -> None:
+    await sockets.close_topic(("group", event.group_id), reason="Group deleted")
 
-    def disconnect(self, thread_id: int, websocket: WebSocket) -> None:
-        if thread_id in self.active_connections:
-            self.active_connections[thread_id].discard(websocket)
-            if not self.active_connections[thread_id]:
-                del self.active_connections[thread_id]
 
-    async def broadcast(self, thread_id: int, payload: dict) -> None:
-        if thread_id not in self.active_connections:
-            return
-        
-        dead_connections = []
-        for websocket in list(self.active_connections[thread_id]):
-            try:
-                await websocket.send_json(payload)
-            except Exception:
-                dead_connections.append(websocket)
-        
-        for websocket in dead_connections:
-            self.disconnect(thread_id, websocket)
+event_bus.subscribe_async(MemberBanned, evict_banned_member)
+event_bus.subscribe_async(MemberJoined, announce_member)
+event_bus.subscribe_async(MemberUnbanned, announce_member)
+event_bus.subscribe_async(GroupDeleted, close_deleted_group)
 
 
-dm_manager = DirectConnectionManager()
+@app.on_event("startup")
+async def bind_event_bus():
+    # Socket handlers run on this loop; crud publishes from worker threads.
+    event_bus.bind(asyncio.get_running_loop())
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
+@app.on_event("shutdown")
+async def unbind_event_bus():
+    event_bus.bind(None)
+
+
+@app.on_event("shutdown")
+def stop_thumbnail_workers():
+    attachments.shutdown_thumbnail_pool()
+
+
+def collect_socket_counts():
+    for (kind, scope_id), count in sockets.topic_sizes():
+        yield ("group" if kind == "group" else "dm", scope_id), count
+
+
+def collect_presence_stats():
+    yield ("online",), presence.online_count
+
+
+def collect_threadpool_stats():
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    yield ("busy",), statistics.borrowed_tokens
+    yield ("waiting",), statistics.tasks_waiting
+    yield ("limit",), statistics.total_tokens
+
+
+def collect_message_cache_stats():
+    stats = message_cache.stats()
+    for name in ("entries", "bytes", "hits", "misses", "evictions"):
+        yield (name,), stats[name]
+
+
+metrics.registry.register(
+    metrics.Gauge(
+        "chat_ws_connections",
+        "Open WebSocket connections per group or DM thread.",
+        ("kind", "scope_id"),
+        collect_socket_counts,
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "presence_users",
+        "Users currently online.",
+        ("state",),
+        collect_presence_stats,
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "threadpool_workers",
+        "Threadpool tokens in use, tasks queued for a worker, and the pool size.",
+        ("state",),
+        collect_threadpool_stats,
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "message_cache",
+        "Recent-message cache size and lookup counters.",
+        ("stat",),
+        collect_message_cache_stats,
+    )
+)
+
+
+def load_message_page(
+    key: tuple[str, int],
+    before_id: int | None,
+    limit: int,
+    load: Callable[[int | None, int], list],
+    encode: Callable[[object], bytes],
+) -> list[tuple[int, bytes]]:
+    """Read a page from the hot table, topping it up from the archive."""
+    encoded = [(message.id, encode(message)) for message in load(before_id, limit)]
+    if len(encoded) < limit:
+        older_than = encoded[0][0] if encoded else before_id
+        encoded = read_archived(*key, older_than, limit - len(encoded)) + encoded
+    return encoded
+
+
+def message_page_response(
+    db: Session,
+    key: tuple[str, int],
+    before_id: int | None,
+    limit: int,
+    load: Callable[[Session, int | None, int], list],
+    encode: Callable[[object], bytes],
+) -> Response:
+    if before_id is not None:
+        page = load_message_page(key, before_id, limit, partial(load, db), encode)
+        return Response(content=encode_message_list(page), media_type="application/json")
+
+    cached = message_cache.get(key, limit)
+    if cached is None:
+        token = message_cache.fill_token(key)
+        fetch = max(limit, message_cache.per_scope)
+        # Fill from the primary: a lagging replica could seed the cache with a
+        # page that lacks messages this process has already appended to it.
+        primary = SessionLocal() if READ_REPLICA else db
+        try:
+            encoded = load_message_page(key, None, fetch, partial(load, primary), encode)
+        finally:
+            if primary is not db:
+                primary.close()
+        message_cache.fill(key, encoded, complete=len(encoded) < fetch, token=token)
+        cached = encode_message_list(encoded[-limit:])
+    return Response(content=cached, media_type="application/json")
+
+
+def read_etag(*keys, params: tuple = ()) -> str | None:
+    """ETag for a read that may come from the replica.
+
+    None while any of ``keys`` changed recently enough that the replica may
+    not have the write yet, so a stale page is never pinned by a new tag.
+    """
+    if READ_REPLICA and versions.bumped_within(READ_YOUR_WRITES_SECONDS, *keys):
+        return None
+    return versions.etag(*keys, params=params)
+
+
+def not_modified(request: Request, response: Response, etag: str | None) -> Response | None:
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def enforce_message_rate(user_id: int, scope: tuple[str, int] | None) -> None:
+    wait = message_retry_after(user_id, scope)
+    if wait:
+        metrics.rate_limited_messages.inc("http")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many messages, slow down",
+            headers={"Retry-After": retry_after_header(wait)},
+        )
+
+
+def message_event(event_type: str, scope_field: str, db_message, sender: models.User) -> dict:
+    return {
+        "type": event_type,
+        "data": {
+            "id": db_message.id,
+            scope_field: getattr(db_message, scope_field),
+            "user_id": db_message.user_id,
+            "sender_username": sender.username,
+            "sender_name": sender.full_name or sender.username,
+            "content": db_message.content,
+            "attachment": (
+                schemas.AttachmentRead.model_validate(db_message.attachment).model_dump()
+                if db_message.attachment is not None
+                else None
+            ),
+            "created_at": db_message.created_at.isoformat(),
+        },
+    }
+
+
+def user_from_token(db: Session, token: str) -> models.User:
     payload = auth.decode_token(token)
     if payload is None or "sub" not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -129,8 +328,96 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = user_from_token(db, token)
+    # Lets the commit route this user's next reads to the primary.
+    db.info["username"] = user.username
+    return user
+
+
+def get_read_db(token: str = Depends(oauth2_scheme)):
+    """Session for read-only endpoints: the replica unless the caller just wrote."""
+    payload = auth.decode_token(token)
+    db = read_session_for(payload.get("sub") if payload else None)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_reader(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+):
+    return user_from_token(db, token)
+
+
+def get_token_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """Authenticate from the token and the user index alone, without a query."""
+    payload = auth.decode_token(token)
+    if payload is None or "sub" not in payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    user_id = user_index.user_id_for(payload["sub"])
+    if user_id is None:
+        # Only users the index has not seen yet (e.g. signed up through another
+        # worker) cost a query, once.
+        db = SessionLocal()
+        try:
+            user = crud.get_user_by_username(db, payload["sub"])
+        finally:
+            db.close()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user_index.upsert(user.id, user.username, user.full_name)
+        user_id = user.id
+    return user_id
+
+
+def save_upload(upload: UploadFile, uploader_id: int, **scope) -> models.Attachment:
+    """Move an upload into the attachment store; the caller commits the row."""
+    try:
+        sha256, size = attachments.store_stream(upload.file)
+    except attachments.AttachmentTooLarge:
+        raise HTTPException(status_code=413, detail="Attachment is too large")
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Attachment is empty")
+    content_type = (upload.content_type or "application/octet-stream").lower()[:100]
+    return models.Attachment(
+        sha256=sha256,
+        size=size,
+        filename=attachments.clean_filename(upload.filename),
+        content_type=content_type,
+        has_thumbnail=attachments.schedule_thumbnail(sha256, content_type),
+        uploader_id=uploader_id,
+        **scope,
+    )
+
+
+def get_readable_attachment(
+    attachment_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> models.Attachment:
+    attachment = crud.get_attachment(db, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if attachment.group_id is not None:
+        allowed = current_user.is_admin or crud.is_member(
+            db, attachment.group_id, current_user.id
+        )
+    else:
+        allowed = crud.is_thread_participant(db, attachment.thread_id, current_user.id)
+    if not allowed:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment
+
+
 @app.post("/auth/signup", response_model=schemas.UserRead)
 def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db.info["username"] = user.username
     if crud.get_user_by_email(db, user.email) or crud.get_user_by_username(db, user.username):
         raise HTTPException(status_code=400, detail="User already exists")
     return crud.create_user(db, user)
@@ -149,7 +436,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @app.get("/users/me", response_model=schemas.UserRead)
-def read_me(current_user: models.User = Depends(get_current_user)):
+def read_me(current_user: models.User = Depends(get_current_reader)):
     return current_user
 
 
@@ -171,12 +458,26 @@ def update_me(
     return crud.update_user(db, current_user, payload)
 
 
+@app.get("/users/search", response_model=list[schemas.UserSummary])
+def search_users(
+    q: str = Query(min_length=1, max_length=120),
+    limit: int = Query(default=10, ge=1, le=50),
+    current_user_id: int = Depends(get_token_user_id),
+):
+    return user_index.search(q, limit=limit, exclude_user_id=current_user_id)
+
+
 @app.get("/users/{user_id}", response_model=schemas.UserSummary)
 def read_user_summary(
     user_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
+    etag = read_etag(("user", user_id), params=(user_id,))
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
     user = crud.get_user_by_id(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -186,8 +487,8 @@ def read_user_summary(
 @app.get("/users/by-username/{username}", response_model=schemas.UserSummary)
 def read_user_by_username(
     username: str,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
     user = crud.get_user_by_username(db, username)
     if user is None:
@@ -221,7 +522,7 @@ def update_group(
     return updated
 
 
-@app.delete("/groups/{group_id}")
+@app.delete("/groups/{group_id}", status_code=202)
 def delete_group(
     group_id: int,
     current_user: models.User = Depends(get_current_user),
@@ -229,38 +530,117 @@ def delete_group(
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin only")
-    deleted = crud.delete_group(db, group_id)
-    if not deleted:
+    job = crud.mark_group_deleted(db, group_id)
+    if not job:
         raise HTTPException(status_code=404, detail="Group not found")
-    return {"deleted": True}
+    start_deletion_job(job.id)
+    return {"deleted": True, "job_id": job.id, "status": job.status}
 
 
-@app.get("/groups", response_model=list[schemas.GroupRead])
-def list_groups(
+@app.get("/groups/{group_id}/deletion", response_model=schemas.GroupDeletionJobRead)
+def read_group_deletion(
+    group_id: int,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin only")
+    job = crud.get_group_deletion_job(db, group_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job
+
+
+@app.get("/groups", response_model=list[schemas.GroupRead])
+def list_groups(
+    request: Request,
+    response: Response,
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
+):
+    etag = read_etag(("groups",), ("memberships", current_user.id), params=("mine",))
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
     return crud.list_groups(db, current_user.id)
 
 
-@app.get("/groups/all", response_model=list[schemas.GroupReadWithMembership])
-def list_all_groups(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+def to_group_with_membership(group: models.Group, is_member: bool):
+    return schemas.GroupReadWithMembership(
+        id=group.id,
+        name=group.name,
+        description=group.description,
+        created_by=group.created_by,
+        created_at=group.created_at,
+        member_count=group.member_count,
+        is_member=is_member,
+    )
+
+
+@app.get("/groups/directory", response_model=schemas.GroupDirectoryPage)
+def list_group_directory(
+    request: Request,
+    response: Response,
+    q: str | None = Query(default=None, max_length=100),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
-    groups = crud.list_all_groups(db)
-    member_ids = crud.get_member_group_ids(db, current_user.id)
-    return [
-        schemas.GroupReadWithMembership(
-            id=group.id,
-            name=group.name,
-            description=group.description,
-            created_by=group.created_by,
-            created_at=group.created_at,
-            is_member=group.id in member_ids,
-        )
-        for group in groups
-    ]
+    etag = read_etag(
+        ("groups",),
+        ("memberships", current_user.id),
+        params=("directory", q, cursor, limit),
+    )
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
+
+    after = None
+    if cursor:
+        try:
+            name, group_id = decode_cursor(cursor, 2)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(name, str) or not isinstance(group_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (name, group_id)
+
+    rows = crud.list_all_groups(
+        db,
+        current_user.id,
+        prefix=q.strip() if q else None,
+        after=after,
+        limit=limit + 1,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_group = rows[-1][0]
+        next_cursor = encode_cursor(last_group.name_key, last_group.id)
+    return schemas.GroupDirectoryPage(
+        items=[to_group_with_membership(group, is_member) for group, is_member in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@app.get("/groups/{group_id}", response_model=schemas.GroupReadWithMembership)
+def read_group(
+    group_id: int,
+    request: Request,
+    response: Response,
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
+):
+    """One directory entry, for groups the client has not paged in yet (deep links)."""
+    etag = read_etag(
+        ("groups",), ("memberships", current_user.id), params=("group", group_id)
+    )
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
+    group = crud.get_group(db, group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    membership = crud.get_membership(db, group_id, current_user.id)
+    return to_group_with_membership(group, membership is not None)
 
 
 @app.post("/groups/{group_id}/join")
@@ -269,16 +649,9 @@ def join_group(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    if not db.query(models.Group).filter(models.Group.id == group_id).first():
+    if not crud.get_group(db, group_id):
         raise HTTPException(status_code=404, detail="Group not found")
-    membership = (
-        db.query(models.GroupMember)
-        .filter(
-            models.GroupMember.group_id == group_id,
-            models.GroupMember.user_id == current_user.id,
-        )
-        .first()
-    )
+    membership = crud.get_membership(db, group_id, current_user.id)
     if membership and membership.is_banned:
         raise HTTPException(status_code=403, detail="You are banned from this group")
     crud.add_member(db, group_id, current_user.id)
@@ -295,76 +668,173 @@ def create_message(
 ):
     if not crud.is_member(db, group_id, current_user.id):
         raise HTTPException(status_code=403, detail="Join the group first")
+    enforce_message_rate(current_user.id, ("group", group_id))
     db_message = crud.add_message(db, group_id, current_user.id, message)
+    presence.stop_typing(("group", group_id), current_user.id)
 
-    payload = {
-        "type": "message",
-        "data": {
-            "id": db_message.id,
-            "group_id": db_message.group_id,
-            "user_id": db_message.user_id,
-            "sender_username": current_user.username,
-            "sender_name": current_user.full_name or current_user.username,
-            "content": db_message.content,
-            "created_at": db_message.created_at.isoformat(),
-        },
-    }
-    background_tasks.add_task(manager.broadcast, group_id, payload)
+    payload = message_event("message", "group_id", db_message, current_user)
+    background_tasks.add_task(sockets.broadcast, ("group", group_id), payload)
+    return db_message
+
+
+@app.post("/groups/{group_id}/attachments", response_model=schemas.MessageRead)
+def create_attachment_message(
+    group_id: int,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    content: str = Form(default="", max_length=2000),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if not crud.is_member(db, group_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Join the group first")
+    enforce_message_rate(current_user.id, ("group", group_id))
+    attachment = save_upload(file, current_user.id, group_id=group_id)
+    message = schemas.MessageCreate(content=content or attachment.filename)
+    db_message = crud.add_message(db, group_id, current_user.id, message, attachment)
+
+    payload = message_event("message", "group_id", db_message, current_user)
+    background_tasks.add_task(sockets.broadcast, ("group", group_id), payload)
     return db_message
 
 
 @app.get("/groups/{group_id}/messages", response_model=list[schemas.MessageRead])
 def list_messages(
+    group_id: int,
+    before_id: int | None = None,
+    limit: int = Query(default=MESSAGE_PAGE_SIZE, ge=1, le=200),
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
+):
+    if not crud.is_member(db, group_id, current_user.id):
+        # Only the refusal needs the row, to say why.
+        membership = crud.get_primary_membership(db, group_id, current_user.id)
+        if membership is not None and membership.is_banned:
+            raise HTTPException(status_code=403, detail="You are banned from this group")
+        raise HTTPException(status_code=403, detail="Join the group first")
+    return message_page_response(
+        db,
+        ("group", group_id),
+        before_id,
+        limit,
+        lambda session, before, count: crud.list_messages(
+            session, group_id, before_id=before, limit=count
+        ),
+        crud.encode_message,
+    )
+
+
+@app.get("/groups/{group_id}/export")
+def export_group_messages(
     group_id: int,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    membership = crud.get_membership(db, group_id, current_user.id)
-    if membership is None:
+    if not current_user.is_admin and not crud.is_member(db, group_id, current_user.id):
         raise HTTPException(status_code=403, detail="Join the group first")
-    if membership.is_banned:
-        raise HTTPException(status_code=403, detail="You are banned from this group")
-    return crud.list_messages(db, group_id)
+    if not crud.get_group(db, group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+    return StreamingResponse(
+        iter_history_ndjson("group", group_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="group-{group_id}.ndjson"'},
+    )
 
 
-@app.get("/groups/{group_id}/members", response_model=list[schemas.GroupMemberRead])
+@app.get("/groups/{group_id}/members", response_model=schemas.GroupMemberPage)
 def list_group_members(
     group_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    role: str | None = Query(default=None, max_length=30),
+    is_banned: bool | None = None,
+    q: str | None = Query(default=None, max_length=120),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
-    membership = crud.get_membership(db, group_id, current_user.id)
+    membership = crud.get_primary_membership(db, group_id, current_user.id)
     if membership is None:
         raise HTTPException(status_code=403, detail="Join the group first")
     if membership.is_banned:
         raise HTTPException(status_code=403, detail="You are banned from this group")
-    members = crud.list_group_members(db, group_id)
-    return [
-        schemas.GroupMemberRead(
-            user_id=member.user_id,
-            username=member.user.username,
-            full_name=member.user.full_name,
-            role=member.role,
-            is_banned=member.is_banned,
-            joined_at=member.joined_at,
-        )
-        for member in members
-    ]
+    etag = read_etag(
+        ("members", group_id),
+        ("users",),
+        params=(group_id, role, is_banned, q, cursor, limit),
+    )
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
+
+    after_user_id = None
+    if cursor:
+        try:
+            (after_user_id,) = decode_cursor(cursor, 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(after_user_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = crud.list_group_members(
+        db,
+        group_id,
+        role=role,
+        is_banned=is_banned,
+        search=q.strip() if q else None,
+        after_user_id=after_user_id,
+        limit=limit + 1,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].user_id)
+    return schemas.GroupMemberPage(
+        items=[
+            schemas.GroupMemberRead(
+                user_id=row.user_id,
+                username=row.username,
+                full_name=row.full_name,
+                role=row.role,
+                is_banned=row.is_banned,
+                joined_at=row.joined_at,
+            )
+            for row in rows
+        ],
+        member_count=crud.get_member_count(db, group_id) or 0,
+        next_cursor=next_cursor,
+    )
+
+
+@app.post("/presence/query", response_model=list[schemas.PresenceRead])
+async def query_presence(
+    query: schemas.PresenceQuery,
+    current_user: models.User = Depends(get_current_reader),
+):
+    # Async so the presence table is only ever read on the event loop.
+    return presence.query(query.user_ids)
 
 
 @app.get("/dm/users", response_model=list[schemas.UserSummary])
 def list_dm_users(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
+    etag = read_etag(("dm_peers", current_user.id), ("users",))
+    if (cached := not_modified(request, response, etag)) is not None:
+        return cached
     return crud.list_dm_users(db, current_user.id)
 
 
 @app.get("/dm/with/{username}/messages", response_model=list[schemas.DirectMessageRead])
 def list_dm_messages(
     username: str,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    before_id: int | None = None,
+    limit: int = Query(default=MESSAGE_PAGE_SIZE, ge=1, le=200),
+    current_user: models.User = Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
 ):
     if username == current_user.username:
         raise HTTPException(status_code=400, detail="Cannot chat with yourself")
@@ -374,7 +844,35 @@ def list_dm_messages(
     thread = crud.get_direct_thread(db, current_user.id, user.id)
     if thread is None:
         return []
-    return crud.list_direct_messages(db, thread.id)
+    return message_page_response(
+        db,
+        ("thread", thread.id),
+        before_id,
+        limit,
+        lambda session, before, count: crud.list_direct_messages(
+            session, thread.id, before_id=before, limit=count
+        ),
+        crud.encode_direct_message,
+    )
+
+
+@app.get("/dm/with/{username}/export")
+def export_dm_messages(
+    username: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    user = crud.get_user_by_username(db, username)
+    if user is None or user.id == current_user.id:
+        raise HTTPException(status_code=404, detail="User not found")
+    thread = crud.get_direct_thread(db, current_user.id, user.id)
+    if thread is None:
+        raise HTTPException(status_code=404, detail="No messages with this user")
+    return StreamingResponse(
+        iter_history_ndjson("thread", thread.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="dm-{thread.id}.ndjson"'},
+    )
 
 
 @app.post("/dm/with/{username}/messages", response_model=schemas.DirectMessageRead)
@@ -390,25 +888,84 @@ def create_dm_message(
     user = crud.get_user_by_username(db, username)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    thread = crud.get_or_create_direct_thread(db, current_user.id, user.id)
+    # Rate-checked before the thread is created, so a refused first message
+    # leaves no empty thread behind.
+    thread = crud.get_direct_thread(db, current_user.id, user.id)
+    enforce_message_rate(current_user.id, ("thread", thread.id) if thread else None)
+    if thread is None:
+        thread = crud.get_or_create_direct_thread(db, current_user.id, user.id)
     db_message = crud.add_direct_message(db, thread.id, current_user.id, message)
+    presence.stop_typing(("thread", thread.id), current_user.id)
 
-    payload = {
-        "type": "dm_message",
-        "data": {
-            "id": db_message.id,
-            "thread_id": db_message.thread_id,
-            "user_id": db_message.user_id,
-            "sender_username": current_user.username,
-            "sender_name": current_user.full_name or current_user.username,
-            "content": db_message.content,
-            "created_at": db_message.created_at.isoformat(),
-        },
-    }
-    background_tasks.add_task(dm_manager.broadcast, thread.id, payload)
+    payload = message_event("dm_message", "thread_id", db_message, current_user)
+    background_tasks.add_task(sockets.broadcast, ("thread", thread.id), payload)
+    return db_message
+
+
+@app.post("/dm/with/{username}/attachments", response_model=schemas.DirectMessageRead)
+def create_dm_attachment_message(
+    username: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    content: str = Form(default="", max_length=2000),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if username == current_user.username:
+        raise HTTPException(status_code=400, detail="Cannot chat with yourself")
+    user = crud.get_user_by_username(db, username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    thread = crud.get_direct_thread(db, current_user.id, user.id)
+    enforce_message_rate(current_user.id, ("thread", thread.id) if thread else None)
+    if thread is None:
+        thread = crud.get_or_create_direct_thread(db, current_user.id, user.id)
+    attachment = save_upload(file, current_user.id, thread_id=thread.id)
+    message = schemas.DirectMessageCreate(content=content or attachment.filename)
+    db_message = crud.add_direct_message(db, thread.id, current_user.id, message, attachment)
+
+    payload = message_event("dm_message", "thread_id", db_message, current_user)
+    background_tasks.add_task(sockets.broadcast, ("thread", thread.id), payload)
     return db_message
 
 
+@app.get("/attachments/{attachment_id}")
+async def download_attachment(
+    attachment: models.Attachment = Depends(get_readable_attachment),
+):
+    return attachments.file_response(
+        attachments.object_path(attachment.sha256),
+        attachment.content_type,
+        attachment.filename,
+    )
+
+
+@app.get("/attachments/{attachment_id}/thumbnail")
+async def download_thumbnail(
+    attachment: models.Attachment = Depends(get_readable_attachment),
+):
+    if not attachment.has_thumbnail:
+        raise HTTPException(status_code=404, detail="No thumbnail for this attachment")
+    path = attachments.thumbnail_path(attachment.sha256)
+    if not os.path.exists(path):
+        # Still rendering, or lost with a restart: wait on (or redo) the render
+        # without tying up a threadpool worker.
+        pending = attachments.pending_thumbnail(attachment.sha256)
+        if pending is None and attachments.schedule_thumbnail(
+            attachment.sha256, attachment.content_type
+        ):
+            pending = attachments.pending_thumbnail(attachment.sha256)
+        if pending is not None:
+            try:
+                await asyncio.wrap_future(pending)
+            except Exception:
+                pass
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Thumbnail is not available")
+    stem = os.path.splitext(attachment.filename)[0]
+    return attachments.file_response(path, "image/jpeg", f"{stem}-thumbnail.jpg")
+
+
 @app.post("/groups/{group_id}/members/{user_id}/ban")
 def ban_member(
     group_id: int,
@@ -441,6 +998,118 @@ def unban_member(
     return {"banned": False}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    # Async so the threadpool gauge is read from the event loop thread.
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/admin/stats")
+def read_admin_stats(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return {"message_cache": message_cache.stats(), "membership_cache": membership_cache.stats()}
+
+
+def save_ws_group_message(group_id: int, user_id: int, message: schemas.MessageCreate):
+    db = SessionLocal()
+    try:
+        if not crud.is_member(db, group_id, user_id):
+            return None
+        db_message = crud.add_message(db, group_id, user_id, message)
+        return message_event("message", "group_id", db_message, db_message.user)
+    finally:
+        db.close()
+
+
+def save_ws_direct_message(thread_id: int, user_id: int, message: schemas.DirectMessageCreate):
+    db = SessionLocal()
+    try:
+        db_message = crud.add_direct_message(db, thread_id, user_id, message)
+        return message_event("dm_message", "thread_id", db_message, db_message.user)
+    finally:
+        db.close()
+
+
+async def receive_ws_message(
+    websocket: WebSocket,
+    user_id: int,
+    scope: tuple[str, int],
+    schema: type[schemas.MessageCreate] | type[schemas.DirectMessageCreate],
+):
+    """Read one client frame; return a validated message to post, or None.
+
+    Clients send ``{"type": "message", "content": "..."}``, plus ``ping``
+    heartbeats (answered with ``pong``) and ``typing`` frames. Any frame
+    keeps the sender online. Messages are charged against the same token
+    buckets as the REST endpoints, and rejections are reported back on the
+    socket as ``error`` events.
+    """
+    try:
+        frame = json.loads(await websocket.receive_text())
+    except ValueError:
+        return None
+    presence.heartbeat(user_id)
+    frame_type = frame.get("type") if isinstance(frame, dict) else None
+    if frame_type == "ping":
+        await websocket.send_json({"type": "pong"})
+        return None
+    if frame_type == "typing":
+        presence.typing(scope, user_id)
+        return None
+    if frame_type != "message":
+        return None
+
+    try:
+        message = schema(content=frame.get("content"))
+    except ValidationError:
+        await websocket.send_json({"type": "error", "detail": "Invalid message"})
+        return None
+    wait = message_retry_after(user_id, scope)
+    if wait:
+        metrics.rate_limited_messages.inc("websocket")
+        await websocket.send_json(
+            {
+                "type": "error",
+                "detail": "Too many messages, slow down",
+                "retry_after": round(wait, 3),
+            }
+        )
+        return None
+    return message
+
+
+def authorize_group_socket(username: str, group_id: int) -> tuple[int, list[int]] | None:
+    """Return the user's id and group ids if they may join the group's socket."""
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username)
+        if user is None or not crud.is_member(db, group_id, user.id):
+            return None
+        return user.id, crud.list_member_group_ids(db, user.id)
+    finally:
+        db.close()
+
+
+def authorize_dm_socket(username: str, other_username: str) -> tuple[int, int, list[int]] | None:
+    """Return the user's id, the thread id and the user's group ids."""
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username)
+        other = crud.get_user_by_username(db, other_username)
+        if user is None or other is None or user.id == other.id:
+            return None
+        thread = crud.get_or_create_direct_thread(db, user.id, other.id)
+        return user.id, thread.id, crud.list_member_group_ids(db, user.id)
+    finally:
+        db.close()
+
+
+# The handlers below look the user up in a short-lived session and then hold
+# only ids, so an idle socket pins no ORM objects and no pooled connection.
 @app.websocket("/ws/groups/{group_id}")
 async def group_ws(websocket: WebSocket, group_id: int, token: str = None):
     # If token is not provided as a dependency, try to get it from query params manually
@@ -452,20 +1121,33 @@ async def group_ws(websocket: WebSocket, group_id: int, token: str = None):
         await websocket.close(code=1008)
         return
 
-    db = SessionLocal()
-    try:
-        user = crud.get_user_by_username(db, payload["sub"])
-        if user is None or not crud.is_member(db, group_id, user.id):
-            await websocket.close(code=1008)
-            return
+    username = payload["sub"]
+    access = await run_in_threadpool(authorize_group_socket, username, group_id)
+    if access is None:
+        await websocket.close(code=1008)
+        return
 
-        await manager.connect(group_id, websocket)
+    user_id, group_ids = access
+    topic = ("group", group_id)
+    connection = await sockets.connect(websocket, user_id, topic)
+    presence.connect(user_id, group_ids)
+    try:
         while True:
-            await websocket.receive_text()
+            message = await receive_ws_message(websocket, user_id, topic, schemas.MessageCreate)
+            if message is None:
+                continue
+            presence.stop_typing(topic, user_id)
+            event = await run_in_threadpool(save_ws_group_message, group_id, user_id, message)
+            if event is None:
+                await websocket.send_json({"type": "error", "detail": "Join the group first"})
+                continue
+            mark_recent_writer(username)
+            await sockets.broadcast(topic, event)
     except WebSocketDisconnect:
-        manager.disconnect(group_id, websocket)
+        pass
     finally:
-        db.close()
+        sockets.disconnect(connection)
+        presence.disconnect(user_id)
 
 
 @app.websocket("/ws/dm/{username}")
@@ -479,20 +1161,29 @@ async def dm_ws(websocket: WebSocket, username: str, token: str = None):
         await websocket.close(code=1008)
         return
 
-    db = SessionLocal()
-    try:
-        user = crud.get_user_by_username(db, payload["sub"])
-        other = crud.get_user_by_username(db, username)
-        if user is None or other is None or user.id == other.id:
-            await websocket.close(code=1008)
-            return
+    sender = payload["sub"]
+    access = await run_in_threadpool(authorize_dm_socket, sender, username)
+    if access is None:
+        await websocket.close(code=1008)
+        return
 
-        thread = crud.get_or_create_direct_thread(db, user.id, other.id)
-        await dm_manager.connect(thread.id, websocket)
+    user_id, thread_id, group_ids = access
+    topic = ("thread", thread_id)
+    connection = await sockets.connect(websocket, user_id, topic)
+    presence.connect(user_id, group_ids)
+    try:
         while True:
-            await websocket.receive_text()
+            message = await receive_ws_message(
+                websocket, user_id, topic, schemas.DirectMessageCreate
+            )
+            if message is None:
+                continue
+            presence.stop_typing(topic, user_id)
+            event = await run_in_threadpool(save_ws_direct_message, thread_id, user_id, message)
+            mark_recent_writer(sender)
+            await sockets.broadcast(topic, event)
     except WebSocketDisconnect:
-        if "thread" in locals():
-            dm_manager.disconnect(thread.id, websocket)
+        pass
     finally:
-        db.close()
+        sockets.disconnect(connection)
+        presence.disconnect(user_id)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .events import GroupDeleted, MemberBanned, MemberJoined, MemberUnbanned, event_bus
+
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "100000"))
+MEMBERSHIP_CACHE_TTL_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "30"))
+
+
+class MembershipCache:
+    """LRU cache of whether a user may post to and read a group.
+
+    Filled by ``crud.is_member`` from primary reads and invalidated by the
+    control events ``crud`` publishes, so the send paths skip the membership
+    query without ever serving a ban late. Every invalidation moves the
+    generation on, and a fill that started before it is dropped, so a read
+    that raced a ban cannot put the old answer back.
+
+    Invalidation only reaches this process. Entries also expire after
+    ``ttl`` seconds, which bounds how long a change made elsewhere (another
+    API process, a script) can go unseen.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (group_id, user_id) -> (allowed, monotonic expiry)
+        self._entries: OrderedDict[tuple[int, int], tuple[bool, float]] = OrderedDict()
+        # group_id -> cached user ids, to drop a deleted group in one step
+        self._by_group: dict[int, set[int]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def fill_token(self) -> int:
+        return self._generation
+
+    def get(self, group_id: int, user_id: int) -> bool | None:
+        with self._lock:
+            entry = self._entries.get((group_id, user_id))
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[(group_id, user_id)]
+                self._forget(group_id, user_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((group_id, user_id))
+            self.hits += 1
+            return entry[0]
+
+    def fill(self, group_id: int, user_id: int, allowed: bool, token: int) -> None:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if self._generation != token:
+                return
+            self._entries[(group_id, user_id)] = (allowed, time.monotonic() + self.ttl)
+            self._entries.move_to_end((group_id, user_id))
+            self._by_group.setdefault(group_id, set()).add(user_id)
+            while len(self._entries) > self.max_entries:
+                (old_group, old_user), _ = self._entries.popitem(last=False)
+                self._forget(old_group, old_user)
+
+    def invalidate(self, group_id: int, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop((group_id, user_id), None) is not None:
+                self._forget(group_id, user_id)
+
+    def invalidate_group(self, group_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for user_id in self._by_group.pop(group_id, ()):
+                self._entries.pop((group_id, user_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _forget(self, group_id: int, user_id: int) -> None:
+        users = self._by_group.get(group_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._by_group[group_id]
+
+
+membership_cache = MembershipCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL_SECONDS)
+
+for _event_type in (MemberJoined, MemberBanned, MemberUnbanned):
+    event_bus.subscribe(
+        _event_type, lambda event: membership_cache.invalidate(event.group_id, event.user_id)
+    )
+event_bus.subscribe(GroupDeleted, lambda event: membership_cache.invalidate_group(event.group_id))
@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+
+MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "50"))
+MESSAGE_CACHE_MAX_BYTES = int(os.getenv("MESSAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rough per-message bookkeeping cost on top of the encoded JSON itself.
+ENTRY_OVERHEAD = 96
+FILL_STRIPES = 256
+
+
+def encode_message_list(messages: list[tuple[int, bytes]]) -> bytes:
+    return b"[" + b",".join(data for _, data in messages) + b"]"
+
+
+class _Entry:
+    __slots__ = ("messages", "complete", "body", "size")
+
+    def __init__(self, messages: list[tuple[int, bytes]], complete: bool) -> None:
+        self.messages = messages
+        self.complete = complete
+        self.body: bytes | None = None
+        self.size = sum(len(data) + ENTRY_OVERHEAD for _, data in messages)
+
+
+class RecentMessageCache:
+    """LRU cache of the newest pre-encoded messages per group or DM thread.
+
+    Keys are ``("group", id)`` or ``("thread", id)``. An entry is only created
+    from a full database read (``fill``); writes append to entries that are
+    already warm. Fills are rejected if a write to the same stripe happened
+    while the database was being read, so a racing ``append`` is never lost.
+    """
+
+    def __init__(self, per_scope: int, max_bytes: int) -> None:
+        self.per_scope = per_scope
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, int], _Entry] = OrderedDict()
+        self._stripes = [0] * FILL_STRIPES
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _stripe(self, key: tuple[str, int]) -> int:
+        return hash(key) % FILL_STRIPES
+
+    def fill_token(self, key: tuple[str, int]) -> int:
+        return self._stripes[self._stripe(key)]
+
+    def get(self, key: tuple[str, int], limit: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (len(entry.messages) < limit and not entry.complete):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if limit >= len(entry.messages):
+                if entry.body is None:
+                    entry.body = encode_message_list(entry.messages)
+                    entry.size += len(entry.body)
+                    self._bytes += len(entry.body)
+                    self._evict()
+                return entry.body
+            return encode_message_list(entry.messages[-limit:])
+
+    def fill(
+        self,
+        key: tuple[str, int],
+        messages: list[tuple[int, bytes]],
+        complete: bool,
+        token: int,
+    ) -> None:
+        with self._lock:
+            if self._stripes[self._stripe(key)] != token:
+                return
+            self._discard(key)
+            entry = _Entry(messages[-self.per_scope :], complete)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, key: tuple[str, int], message_id: int, data: bytes) -> None:
+        with self._lock:
+            self._stripes[self._stripe(key)] += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            messages = entry.messages
+            position = len(messages)
+            while position > 0 and messages[position - 1][0] > message_id:
+                position -= 1
+            messages.insert(position, (message_id, data))
+            entry.size += len(data) + ENTRY_OVERHEAD
+            self._bytes += len(data) + ENTRY_OVERHEAD
+            while len(messages) > self.per_scope:
+                _, dropped = messages.pop(0)
+                entry.size -= len(dropped) + ENTRY_OVERHEAD
+                self._bytes -= len(dropped) + ENTRY_OVERHEAD
+                entry.complete = False
+            self._drop_body(entry)
+            self._evict()
+
+    def invalidate(self, key: tuple[str, int]) -> None:
+        with self._lock:
+            self._stripes[self._stripe(key)] += 1
+            self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stripes = [value + 1 for value in self._stripes]
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _drop_body(self, entry: _Entry) -> None:
+        if entry.body is not None:
+            entry.size -= len(entry.body)
+            self._bytes -= len(entry.body)
+            entry.body = None
+
+    def _discard(self, key: tuple[str, int]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+
+message_cache = RecentMessageCache(MESSAGE_CACHE_SIZE, MESSAGE_CACHE_MAX_BYTES)
@@ -0,0 +1,356 @@
+"""Versioned schema migrations for the main and archive databases.
+
+Each database keeps a ``schema_migrations`` table listing the versions
+applied to it. Run pending migrations before starting (or upgrading) the API:
+
+    python -m app.migrate            # apply everything pending
+    python -m app.migrate --status   # show current and latest versions
+
+Migrations are written to be safe against databases created by the old
+``create_all`` startup: tables are created only when missing, columns are
+added only when absent, and indexes use ``IF NOT EXISTS``. Index builds on
+large tables run outside a transaction with ``CREATE INDEX CONCURRENTLY`` on
+PostgreSQL so reads and writes keep flowing. SQLite has no such build: the
+database is switched to WAL so readers carry on, but the build holds the
+write lock throughout, and API writers wait at most
+``SQLITE_BUSY_TIMEOUT_SECONDS`` before failing. On SQLite, run migrations
+that build indexes on large tables in a maintenance window. The same goes
+for migration 6 (``message_ids_autoincrement``), which on SQLite copies
+``messages`` and ``direct_messages`` into rebuilt tables inside a single
+write transaction; API writes fail for as long as the copy takes.
+
+The API itself only compares the recorded version with ``LATEST_VERSION`` at
+startup and refuses to boot when migrations are pending.
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .archive import ArchiveBase, ArchiveSegment, archive_engine
+from .crud import group_name_key
+from .database import SQLITE_BUSY_TIMEOUT_SECONDS, Base, engine
+
+logger = logging.getLogger(__name__)
+
+
+_migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    # Non-transactional migrations run on an autocommit connection, which
+    # CREATE INDEX CONCURRENTLY requires; they must be safe to re-run.
+    transactional: bool = True
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(info["name"] == column for info in inspect(conn).get_columns(table))
+
+
+def _index_is_invalid(conn: Connection, name: str) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT NOT i.indisvalid FROM pg_index i"
+                " JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ),
+            {"name": name},
+        ).scalar()
+    )
+
+
+def create_index(conn: Connection, name: str, table: str, columns: tuple[str, ...]) -> None:
+    """Build an index, concurrently on PostgreSQL; on SQLite writers wait for it.
+
+    A CONCURRENTLY build that fails leaves an INVALID index behind, which
+    ``IF NOT EXISTS`` would then accept as done. Such an index is dropped
+    before building, and a failed build drops its own, so the migration is
+    only recorded once a valid index exists.
+    """
+    statement = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    started = time.perf_counter()
+    if conn.dialect.name == "postgresql":
+        if _index_is_invalid(conn, name):
+            logger.warning("dropping invalid index %s left by an earlier build", name)
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        try:
+            conn.execute(text(statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)))
+        except Exception:
+            try:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            except Exception:
+                # The check above drops it on the next run instead.
+                logger.exception("could not drop index %s after a failed build", name)
+            raise
+    else:
+        conn.execute(text(statement))
+    logger.info("index %s ready in %.1fs", name, time.perf_counter() - started)
+
+
+def _baseline(conn: Connection) -> None:
+    """Create whatever tables are missing.
+
+    A fresh database gets the current schema in one step, which is why every
+    later migration has to tolerate finding its change already in place.
+    Databases made by the old startup ``create_all`` keep their tables as
+    they are and are brought forward by the migrations that follow.
+    """
+    Base.metadata.create_all(bind=conn, checkfirst=True)
+
+
+def _group_counters_and_soft_delete(conn: Connection) -> None:
+    if not _has_column(conn, "groups", "member_count"):
+        conn.execute(text("ALTER TABLE groups ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0"))
+    if not _has_column(conn, "groups", "deleted_at"):
+        conn.execute(text("ALTER TABLE groups ADD COLUMN deleted_at TIMESTAMP"))
+    conn.execute(
+        text(
+            "UPDATE groups SET member_count = ("
+            " SELECT COUNT(*) FROM group_members"
+            " WHERE group_members.group_id = groups.id AND NOT group_members.is_banned)"
+        )
+    )
+
+
+def _group_deletion_jobs(conn: Connection) -> None:
+    models.GroupDeletionJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def _message_scope_indexes(conn: Connection) -> None:
+    # History pages filter on the scope and order by id, so the composite
+    # index serves both the lookup and the sort.
+    create_index(conn, "ix_messages_group_id_id", "messages", ("group_id", "id"))
+    create_index(
+        conn, "ix_direct_messages_thread_id_id", "direct_messages", ("thread_id", "id")
+    )
+    create_index(
+        conn, "ix_group_members_group_user", "group_members", ("group_id", "user_id")
+    )
+
+
+def _attachments(conn: Connection) -> None:
+    models.Attachment.__table__.create(bind=conn, checkfirst=True)
+    for table in ("messages", "direct_messages"):
+        if not _has_column(conn, table, "attachment_id"):
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table} ADD COLUMN attachment_id INTEGER "
+                    "REFERENCES attachments(id)"
+                )
+            )
+
+
+def _archived_max_id(kind: str) -> int:
+    with archive_engine.connect() as archive_conn:
+        if not inspect(archive_conn).has_table(ArchiveSegment.__tablename__):
+            return 0
+        return (
+            archive_conn.execute(
+                text("SELECT MAX(last_id) FROM archive_segments WHERE kind = :kind"),
+                {"kind": kind},
+            ).scalar()
+            or 0
+        )
+
+
+def _rebuild_with_autoincrement(conn: Connection, table: Table, kind: str) -> None:
+    """Recreate a SQLite table as AUTOINCREMENT so rowids are never reused.
+
+    The copy runs in the migration's write transaction and takes time
+    proportional to the table, so run it with the API stopped.
+    """
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": table.name},
+    ).scalar()
+    if sql is not None and "AUTOINCREMENT" not in sql.upper():
+        existing = {info["name"] for info in inspect(conn).get_columns(table.name)}
+        for index in inspect(conn).get_indexes(table.name):
+            conn.execute(text(f"DROP INDEX {index['name']}"))
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+        table.create(bind=conn)
+        columns = ", ".join(column.name for column in table.columns if column.name in existing)
+        conn.execute(
+            text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old")
+        )
+        conn.execute(text(f"DROP TABLE {table.name}_old"))
+
+    # Ids that only live in the archive any more must not be handed out again.
+    floor = _archived_max_id(kind)
+    updated = conn.execute(
+        text("UPDATE sqlite_sequence SET seq = MAX(seq, :floor) WHERE name = :name"),
+        {"floor": floor, "name": table.name},
+    ).rowcount
+    if not updated and floor:
+        conn.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :floor)"),
+            {"floor": floor, "name": table.name},
+        )
+
+
+def _group_name_key(conn: Connection) -> None:
+    if not _has_column(conn, "groups", "name_key"):
+        conn.execute(
+            text("ALTER TABLE groups ADD COLUMN name_key VARCHAR(100) NOT NULL DEFAULT ''")
+        )
+    # Backfilled in Python: SQL lower() only folds ASCII on SQLite, and the
+    # key has to match what crud.group_name_key writes.
+    groups = conn.execute(text("SELECT id, name FROM groups")).all()
+    for group_id, name in groups:
+        conn.execute(
+            text("UPDATE groups SET name_key = :key WHERE id = :id"),
+            {"key": group_name_key(name), "id": group_id},
+        )
+
+
+def _group_name_key_index(conn: Connection) -> None:
+    create_index(conn, "ix_groups_name_key", "groups", ("name_key",))
+
+
+def _message_ids_autoincrement(conn: Connection) -> None:
+    # Other databases use sequences, which never hand out an id twice. On
+    # SQLite this rewrites both message tables: a maintenance-window step.
+    if conn.dialect.name != "sqlite":
+        return
+    _rebuild_with_autoincrement(conn, models.Message.__table__, "group")
+    _rebuild_with_autoincrement(conn, models.DirectMessage.__table__, "thread")
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "group_member_count_and_soft_delete", _group_counters_and_soft_delete),
+    Migration(3, "group_deletion_jobs", _group_deletion_jobs),
+    Migration(4, "message_scope_indexes", _message_scope_indexes, transactional=False),
+    Migration(5, "attachments", _attachments),
+    Migration(6, "message_ids_autoincrement", _message_ids_autoincrement),
+    Migration(7, "group_name_key", _group_name_key),
+    Migration(8, "group_name_key_index", _group_name_key_index, transactional=False),
+]
+
+ARCHIVE_MIGRATIONS = [
+    Migration(1, "archive_segments", lambda conn: ArchiveBase.metadata.create_all(bind=conn)),
+]
+
+# name -> (engine, migrations)
+DATABASES = {
+    "main": (engine, MIGRATIONS),
+    "archive": (archive_engine, ARCHIVE_MIGRATIONS),
+}
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(bind: Engine) -> int:
+    with bind.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return 0
+        return conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar() or 0
+
+
+def _prepare_sqlite(bind: Engine) -> None:
+    with bind.connect() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+
+
+def _connect(bind: Engine, autocommit: bool) -> Connection:
+    conn = bind.connect()
+    if autocommit:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+    if bind.dialect.name == "sqlite":
+        conn.execute(text(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_SECONDS * 1000)}"))
+        if not autocommit:
+            conn.commit()
+    return conn
+
+
+def upgrade(bind: Engine, migrations: list[Migration]) -> list[int]:
+    """Apply pending ``migrations`` to ``bind``; return the versions applied."""
+    if bind.dialect.name == "sqlite":
+        _prepare_sqlite(bind)
+    schema_migrations.create(bind=bind, checkfirst=True)
+    applied_version = current_version(bind)
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= applied_version:
+            continue
+        logger.info("applying migration %s %s", migration.version, migration.name)
+        started = time.perf_counter()
+        with _connect(bind, autocommit=not migration.transactional) as conn:
+            if migration.transactional:
+                with conn.begin():
+                    migration.apply(conn)
+                    _record(conn, migration)
+            else:
+                migration.apply(conn)
+                _record(conn, migration)
+        logger.info(
+            "migration %s done in %.1fs", migration.version, time.perf_counter() - started
+        )
+        applied.append(migration.version)
+    return applied
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.utcnow(),
+        )
+    )
+
+
+def upgrade_all() -> dict[str, list[int]]:
+    return {name: upgrade(bind, migrations) for name, (bind, migrations) in DATABASES.items()}
+
+
+def check_schema() -> None:
+    """Fail fast when either database is behind; one query per database."""
+    for name, (bind, migrations) in DATABASES.items():
+        version = current_version(bind)
+        if version < migrations[-1].version:
+            raise RuntimeError(
+                f"The {name} database schema is at version {version}, expected "
+                f"{migrations[-1].version}. Run `python -m app.migrate` first."
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument(
+        "--status", action="store_true", help="Only print current and latest versions"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.status:
+        status = {
+            name: {"current": current_version(bind), "latest": migrations[-1].version}
+            for name, (bind, migrations) in DATABASES.items()
+        }
+        print(json.dumps(status))
+        return
+    print(json.dumps({"applied": upgrade_all()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -26,9 +26,13 @@ class Group(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), index=True)
+    # Lowercased name; the directory sorts and prefix-matches on it.
+    name_key: Mapped[str] = mapped_column(String(100), index=True, default="", server_default="")
     description: Mapped[str | None] = mapped_column(String(255))
     created_by: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    member_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     members = relationship("GroupMember", back_populates="group")
     messages = relationship("Message", back_populates="group")
@@ -36,6 +40,7 @@ class Group(Base):
 
 class GroupMember(Base):
     __tablename__ = "group_members"
+    __table_args__ = (Index("ix_group_members_group_user", "group_id", "user_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id"))
@@ -48,17 +53,52 @@ class GroupMember(Base):
     user = relationship("User", back_populates="groups")
 
 
+class GroupDeletionJob(Base):
+    __tablename__ = "group_deletion_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    group_id: Mapped[int] = mapped_column(Integer, unique=True, index=True)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    messages_deleted: Mapped[int] = mapped_column(Integer, default=0)
+    members_deleted: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    sha256: Mapped[str] = mapped_column(String(64), index=True)
+    size: Mapped[int] = mapped_column(Integer)
+    filename: Mapped[str] = mapped_column(String(255))
+    content_type: Mapped[str] = mapped_column(String(100))
+    has_thumbnail: Mapped[bool] = mapped_column(default=False)
+    uploader_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    group_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("groups.id"), index=True)
+    thread_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("direct_threads.id"))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_group_id_id", "group_id", "id"),
+        # Archived ids must never be handed out again.
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id"))
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     content: Mapped[str] = mapped_column(Text)
+    attachment_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("attachments.id"))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     group = relationship("Group", back_populates="messages")
     user = relationship("User", back_populates="messages")
+    attachment = relationship("Attachment")
 
     @property
     def sender_username(self) -> str:
@@ -89,15 +129,21 @@ class DirectThread(Base):
 
 class DirectMessage(Base):
     __tablename__ = "direct_messages"
+    __table_args__ = (
+        Index("ix_direct_messages_thread_id_id", "thread_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     thread_id: Mapped[int] = mapped_column(Integer, ForeignKey("direct_threads.id"))
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     content: Mapped[str] = mapped_column(Text)
+    attachment_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("attachments.id"))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     thread = relationship("DirectThread", back_populates="messages")
     user = relationship("User")
+    attachment = relationship("Attachment")
 
     @property
     def sender_username(self) -> str:
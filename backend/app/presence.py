@@ -0,0 +1,207 @@
+"""Online presence and typing indicators derived from open WebSockets.
+
+The socket handlers report connects, disconnects, heartbeats (any client
+frame, normally ``{"type": "ping"}``) and typing frames. A user is online
+while they hold at least one socket that has been heard from within
+``PRESENCE_TIMEOUT_SECONDS``; otherwise ``last_seen`` says when they left.
+
+Changes are not pushed as they happen. They are queued per group or DM
+thread, a user flipping back within one interval cancels out, and
+``run`` flushes at most one ``presence`` and one ``typing`` frame per scope
+every ``PRESENCE_FLUSH_INTERVAL``. A group with N open sockets therefore
+costs O(N) sends per interval however many of its members come and go,
+instead of O(N) per change.
+
+All state is touched from the event loop only, so there is no locking.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TIMEOUT_SECONDS = float(os.getenv("PRESENCE_TIMEOUT_SECONDS", "60"))
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "1.0"))
+TYPING_TTL_SECONDS = float(os.getenv("TYPING_TTL_SECONDS", "5"))
+
+# ("group", group_id) or ("thread", thread_id), as used by the rate limiter.
+Scope = tuple[str, int]
+SCOPE_FIELDS = {"group": "group_id", "thread": "thread_id"}
+
+
+class _UserPresence:
+    __slots__ = ("sockets", "heartbeat", "online", "last_seen", "group_ids")
+
+    def __init__(self) -> None:
+        self.sockets = 0
+        self.heartbeat = 0.0
+        self.online = False
+        self.last_seen: float | None = None
+        # Groups to notify; only kept while the user is connected.
+        self.group_ids: tuple[int, ...] = ()
+
+
+class PresenceHub:
+    def __init__(self) -> None:
+        self._users: dict[int, _UserPresence] = {}
+        self.online_count = 0
+        # scope -> user_id -> online, for changes not yet flushed
+        self._changes: dict[Scope, dict[int, bool]] = {}
+        # scope -> user_id -> monotonic expiry of the typing indicator
+        self._typing: dict[Scope, dict[int, float]] = {}
+        self._typing_dirty: set[Scope] = set()
+        self._next_expiry_scan = 0.0
+
+    def _set_online(self, user_id: int, entry: _UserPresence, online: bool) -> None:
+        if entry.online == online:
+            return
+        entry.online = online
+        self.online_count += 1 if online else -1
+        if not online:
+            entry.last_seen = time.time()
+        for group_id in entry.group_ids:
+            self._queue_change(("group", group_id), user_id, online)
+
+    def _queue_change(self, scope: Scope, user_id: int, online: bool) -> None:
+        pending = self._changes.setdefault(scope, {})
+        if pending.pop(user_id, None) is None:
+            pending[user_id] = online
+        # else: reverted within the interval, nothing to announce
+
+    def connect(self, user_id: int, group_ids: Iterable[int]) -> None:
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = _UserPresence()
+        if entry.sockets == 0:
+            entry.group_ids = tuple(group_ids)
+        entry.sockets += 1
+        entry.heartbeat = time.monotonic()
+        self._set_online(user_id, entry, True)
+
+    def disconnect(self, user_id: int) -> None:
+        entry = self._users.get(user_id)
+        if entry is None or entry.sockets == 0:
+            return
+        entry.sockets -= 1
+        if entry.sockets == 0:
+            self._set_online(user_id, entry, False)
+            entry.group_ids = ()
+            for scope in [scope for scope, users in self._typing.items() if user_id in users]:
+                self.stop_typing(scope, user_id)
+
+    def join_group(self, user_id: int, group_id: int) -> None:
+        """Announce a connected user in a group they joined after connecting."""
+        entry = self._users.get(user_id)
+        if entry is None or entry.sockets == 0 or group_id in entry.group_ids:
+            return
+        entry.group_ids += (group_id,)
+        if entry.online:
+            self._queue_change(("group", group_id), user_id, True)
+
+    def leave_group(self, user_id: int, group_id: int) -> None:
+        """Stop announcing a user in a group, e.g. once they are banned from it."""
+        entry = self._users.get(user_id)
+        if entry is None or group_id not in entry.group_ids:
+            return
+        entry.group_ids = tuple(other for other in entry.group_ids if other != group_id)
+        if entry.online:
+            self._queue_change(("group", group_id), user_id, False)
+        self.stop_typing(("group", group_id), user_id)
+
+    def heartbeat(self, user_id: int) -> None:
+        entry = self._users.get(user_id)
+        if entry is None or entry.sockets == 0:
+            return
+        entry.heartbeat = time.monotonic()
+        self._set_online(user_id, entry, True)
+
+    def typing(self, scope: Scope, user_id: int) -> None:
+        users = self._typing.setdefault(scope, {})
+        if user_id not in users:
+            self._typing_dirty.add(scope)
+        # Repeated typing frames only push the expiry out.
+        users[user_id] = time.monotonic() + TYPING_TTL_SECONDS
+
+    def stop_typing(self, scope: Scope, user_id: int) -> None:
+        users = self._typing.get(scope)
+        if users and users.pop(user_id, None) is not None:
+            self._typing_dirty.add(scope)
+            if not users:
+                del self._typing[scope]
+
+    def query(self, user_ids: Iterable[int]) -> list[dict]:
+        items = []
+        for user_id in user_ids:
+            entry = self._users.get(user_id)
+            last_seen = entry.last_seen if entry is not None else None
+            items.append(
+                {
+                    "user_id": user_id,
+                    "online": entry is not None and entry.online,
+                    "last_seen": (
+                        datetime.fromtimestamp(last_seen, timezone.utc)
+                        if last_seen is not None
+                        else None
+                    ),
+                }
+            )
+        return items
+
+    def _expire(self, now: float) -> None:
+        if now >= self._next_expiry_scan:
+            self._next_expiry_scan = now + PRESENCE_TIMEOUT_SECONDS / 4
+            cutoff = now - PRESENCE_TIMEOUT_SECONDS
+            for user_id, entry in self._users.items():
+                if entry.online and entry.heartbeat < cutoff:
+                    self._set_online(user_id, entry, False)
+
+        for scope, users in list(self._typing.items()):
+            expired = [user_id for user_id, expires in users.items() if expires <= now]
+            for user_id in expired:
+                self.stop_typing(scope, user_id)
+
+    async def flush(self, publish: Callable[[Scope, dict], Awaitable[None]]) -> None:
+        self._expire(time.monotonic())
+        changes, self._changes = self._changes, {}
+        typing_dirty, self._typing_dirty = self._typing_dirty, set()
+
+        for scope, users in changes.items():
+            if not users:
+                continue
+            await publish(
+                scope,
+                {
+                    "type": "presence",
+                    "data": {
+                        SCOPE_FIELDS[scope[0]]: scope[1],
+                        "online": [user_id for user_id, online in users.items() if online],
+                        "offline": [user_id for user_id, online in users.items() if not online],
+                    },
+                },
+            )
+        for scope in typing_dirty:
+            await publish(
+                scope,
+                {
+                    "type": "typing",
+                    "data": {
+                        SCOPE_FIELDS[scope[0]]: scope[1],
+                        "user_ids": sorted(self._typing.get(scope, ())),
+                    },
+                },
+            )
+
+    async def run(self, publish: Callable[[Scope, dict], Awaitable[None]]) -> None:
+        while True:
+            await asyncio.sleep(PRESENCE_FLUSH_INTERVAL)
+            try:
+                await self.flush(publish)
+            except Exception:
+                logger.exception("Presence flush failed")
+
+
+presence = PresenceHub()
@@ -0,0 +1,197 @@
+"""Opt-in per-request SQL profiling, enabled with ``SQL_PROFILE=1``.
+
+Every statement executed while serving a request is recorded with its
+duration and the ``crud`` function that issued it. The totals come back in
+an ``X-SQL-Profile`` response header, statements slower than
+``SLOW_QUERY_MS`` go to the ``app.slow_query`` logger, and requests issuing
+more than ``SLOW_REQUEST_QUERIES`` statements are logged with their full
+breakdown. ``PROFILE_SAMPLE_RATE`` additionally runs that fraction of
+endpoint calls under cProfile (or pyinstrument with
+``PROFILE_ENGINE=pyinstrument``) and writes the result to ``PROFILE_DIR``.
+"""
+
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import sys
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import crud
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "").lower() in {"1", "true", "yes"}
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ENGINE = os.getenv("PROFILE_ENGINE", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+slow_query_logger = logging.getLogger("app.slow_query")
+logger = logging.getLogger(__name__)
+
+CRUD_MODULE = crud.__name__
+
+
+class RequestProfile:
+    __slots__ = ("statements", "sampled", "profiler")
+
+    def __init__(self, sampled: bool) -> None:
+        self.statements: list[tuple[str, float, str]] = []
+        self.sampled = sampled
+        self.profiler = None
+
+    def summary(self) -> str:
+        total_ms = sum(duration for _, duration, _ in self.statements)
+        by_function: dict[str, list[float]] = {}
+        for caller, duration, _ in self.statements:
+            entry = by_function.setdefault(caller, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+        breakdown = ",".join(
+            f"{caller}:{count}:{duration:.2f}"
+            for caller, (count, duration) in sorted(
+                by_function.items(), key=lambda item: -item[1][1]
+            )
+        )
+        return f"queries={len(self.statements)}; total_ms={total_ms:.2f}; by_function={breakdown}"
+
+
+_current_profile: ContextVar[RequestProfile | None] = ContextVar("sql_profile", default=None)
+
+
+def _calling_crud_function() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == CRUD_MODULE:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "other"
+
+
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["profile_start"].pop()) * 1000
+        caller = _calling_crud_function()
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.statements.append((caller, duration_ms, statement))
+        if duration_ms >= SLOW_QUERY_MS:
+            slow_query_logger.warning(
+                "slow query %.1fms in %s: %s", duration_ms, caller, " ".join(statement.split())
+            )
+
+
+def _start_profiler():
+    if PROFILE_ENGINE == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed; falling back to cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler) -> None:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _dump_profile(profiler, method: str, route: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    base = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{method}-{slug}")
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(base + ".prof")
+    else:
+        with open(base + ".html", "w", encoding="utf-8") as handle:
+            handle.write(profiler.output_html())
+
+
+def _profiled_endpoint(endpoint):
+    """Run sampled calls of ``endpoint`` under a profiler in whichever thread runs it."""
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None or not profile.sampled:
+                return await endpoint(*args, **kwargs)
+            profiler = _start_profiler()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _stop_profiler(profiler)
+                profile.profiler = profiler
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None or not profile.sampled:
+            return endpoint(*args, **kwargs)
+        profiler = _start_profiler()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _stop_profiler(profiler)
+            profile.profiler = profiler
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs) -> None:
+        super().__init__(path, _profiled_endpoint(endpoint), **kwargs)
+
+
+class SQLProfilingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+        profile = RequestProfile(sampled)
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-profile", profile.summary().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            if len(profile.statements) > SLOW_REQUEST_QUERIES:
+                logger.warning(
+                    "%s %s issued %s", scope["method"], route, profile.summary()
+                )
+            if profile.profiler is not None:
+                _dump_profile(profile.profiler, scope["method"], route)
@@ -0,0 +1,86 @@
+import math
+import os
+import threading
+import time
+from typing import Hashable
+
+USER_MESSAGE_RATE = float(os.getenv("USER_MESSAGE_RATE", "5"))
+USER_MESSAGE_BURST = float(os.getenv("USER_MESSAGE_BURST", "10"))
+SCOPE_MESSAGE_RATE = float(os.getenv("SCOPE_MESSAGE_RATE", "50"))
+SCOPE_MESSAGE_BURST = float(os.getenv("SCOPE_MESSAGE_BURST", "100"))
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by user id, group or thread.
+
+    Each bucket is a two-item list ``[tokens, last_refill]`` refilled lazily on
+    access, so a check is a dict lookup and a little arithmetic under a lock.
+    Buckets that have refilled completely carry no state worth keeping and are
+    swept once the table grows past ``max_keys``.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: dict[Hashable, list[float]] = {}
+
+    def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; return 0 on success or seconds until it would succeed."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._sweep(now)
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+    def refund(self, key: Hashable, cost: float = 1.0) -> None:
+        """Give back tokens taken by ``acquire`` for an action that did not happen."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def _sweep(self, now: float) -> None:
+        full = [
+            key
+            for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]
+        for key in full:
+            del self._buckets[key]
+
+
+user_limiter = TokenBucketLimiter(USER_MESSAGE_RATE, USER_MESSAGE_BURST)
+scope_limiter = TokenBucketLimiter(SCOPE_MESSAGE_RATE, SCOPE_MESSAGE_BURST)
+
+
+def message_retry_after(user_id: int, scope: tuple[str, int] | None) -> float:
+    """Charge one message to the sender and the group/thread; 0 means allowed.
+
+    A message refused by either bucket costs nothing: the sender's token is
+    refunded when the scope turns it away. ``scope`` is None for a DM thread
+    that does not exist yet, whose bucket would be full anyway.
+    """
+    wait = user_limiter.acquire(user_id)
+    if wait or scope is None:
+        return wait
+    wait = scope_limiter.acquire(scope)
+    if wait:
+        user_limiter.refund(user_id)
+    return wait
+
+
+def retry_after_header(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
@@ -40,6 +40,12 @@ class GroupMemberRead(BaseModel):
     joined_at: datetime
 
 
+class GroupMemberPage(BaseModel):
+    items: list[GroupMemberRead]
+    member_count: int
+    next_cursor: str | None = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -56,6 +62,7 @@ class GroupRead(BaseModel):
     description: str | None
     created_by: int
     created_at: datetime
+    member_count: int = 0
 
     class Config:
         from_attributes = True
@@ -65,6 +72,37 @@ class GroupReadWithMembership(GroupRead):
     is_member: bool
 
 
+class GroupDirectoryPage(BaseModel):
+    items: list[GroupReadWithMembership]
+    next_cursor: str | None = None
+
+
+class GroupDeletionJobRead(BaseModel):
+    id: int
+    group_id: int
+    status: str
+    messages_deleted: int
+    members_deleted: int
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AttachmentRead(BaseModel):
+    id: int
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    has_thumbnail: bool
+
+    class Config:
+        from_attributes = True
+
+
 class MessageCreate(BaseModel):
     content: str = Field(min_length=1, max_length=2000)
 
@@ -76,6 +114,7 @@ class MessageRead(BaseModel):
     sender_username: str
     sender_name: str
     content: str
+    attachment: AttachmentRead | None = None
     created_at: datetime
 
     class Config:
@@ -93,12 +132,23 @@ class DirectMessageRead(BaseModel):
     sender_username: str
     sender_name: str
     content: str
+    attachment: AttachmentRead | None = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class PresenceQuery(BaseModel):
+    user_ids: list[int] = Field(max_length=10000)
+
+
+class PresenceRead(BaseModel):
+    user_id: int
+    online: bool
+    last_seen: datetime | None = None
+
+
 class UserUpdate(BaseModel):
     full_name: str | None = Field(default=None, max_length=120)
     username: str | None = Field(default=None, min_length=3, max_length=50)
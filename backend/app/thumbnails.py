@@ -0,0 +1,24 @@
+"""Thumbnail rendering, executed in worker processes by ``app.attachments``.
+
+Only imports Pillow so spawned workers start quickly and never touch the
+database or the event loop.
+"""
+
+import os
+
+from PIL import Image
+
+# Refuse decompression bombs rather than exhausting a worker's memory.
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+def render_thumbnail(source: str, destination: str, size: int) -> None:
+    temp_path = f"{destination}.{os.getpid()}.tmp"
+    with Image.open(source) as image:
+        # Lets the JPEG decoder downscale while decoding instead of after.
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(temp_path, "JPEG", quality=80, optimize=True)
+    os.replace(temp_path, destination)
@@ -0,0 +1,98 @@
+import threading
+from bisect import bisect_left, insort
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class UserSearchIndex:
+    """Sorted in-memory index of lowercased username and full-name prefixes.
+
+    Every user contributes one key for the username, one for the full name and
+    one per extra word of the full name, so "ann" finds both "annie" and
+    "Mary Ann". Lookups are a bisect plus a short scan and never touch the DB.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: list[tuple[str, int]] = []
+        self._users: dict[int, tuple[str, str | None]] = {}
+        self._ids: dict[str, int] = {}
+
+    @staticmethod
+    def _keys_for(username: str, full_name: str | None) -> set[str]:
+        keys = {username.lower()}
+        if full_name:
+            name = full_name.lower().strip()
+            if name:
+                keys.add(name)
+                keys.update(word for word in name.split() if word)
+        return keys
+
+    def load(self, db: Session) -> None:
+        rows = db.query(models.User.id, models.User.username, models.User.full_name).all()
+        keys: list[tuple[str, int]] = []
+        users: dict[int, tuple[str, str | None]] = {}
+        for user_id, username, full_name in rows:
+            users[user_id] = (username, full_name)
+            keys.extend((key, user_id) for key in self._keys_for(username, full_name))
+        keys.sort()
+        ids = {username: user_id for user_id, (username, _) in users.items()}
+        with self._lock:
+            self._keys = keys
+            self._users = users
+            self._ids = ids
+
+    def upsert(self, user_id: int, username: str, full_name: str | None) -> None:
+        with self._lock:
+            previous = self._users.get(user_id)
+            if previous is not None:
+                for key in self._keys_for(*previous):
+                    position = bisect_left(self._keys, (key, user_id))
+                    if position < len(self._keys) and self._keys[position] == (key, user_id):
+                        del self._keys[position]
+                self._ids.pop(previous[0], None)
+            self._users[user_id] = (username, full_name)
+            self._ids[username] = user_id
+            for key in self._keys_for(username, full_name):
+                insort(self._keys, (key, user_id))
+
+    def user_id_for(self, username: str) -> int | None:
+        return self._ids.get(username)
+
+    def names_for(self, user_id: int) -> tuple[str, str | None] | None:
+        """Current ``(username, full_name)`` of a user, or None if unknown."""
+        return self._users.get(user_id)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        exclude_user_id: int | None = None,
+    ) -> list[dict]:
+        prefix = query.lower().strip()
+        if not prefix:
+            return []
+
+        results: list[dict] = []
+        seen: set[int] = set()
+        with self._lock:
+            position = bisect_left(self._keys, (prefix, -1))
+            while position < len(self._keys) and len(results) < limit:
+                key, user_id = self._keys[position]
+                position += 1
+                if not key.startswith(prefix):
+                    break
+                if user_id in seen or user_id == exclude_user_id:
+                    continue
+                seen.add(user_id)
+                username, full_name = self._users[user_id]
+                results.append({"id": user_id, "username": username, "full_name": full_name})
+        return results
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+user_index = UserSearchIndex()
@@ -0,0 +1,52 @@
+import hashlib
+import secrets
+import threading
+import time
+from typing import Hashable
+
+
+class VersionStamps:
+    """Write counters used to build ETags for read endpoints.
+
+    Writers in ``crud`` bump the counters for whatever they touched; readers
+    hash the counters they depend on into an ETag and can answer 304 without
+    running their query. Counters live in this process only, like the
+    WebSocket registry, and the random epoch makes every restart a miss.
+
+    Keys in use:
+    ``("groups",)`` group rows, including member counts;
+    ``("memberships", user_id)`` the groups a user belongs to;
+    ``("members", group_id)`` the member set of a group;
+    ``("users",)`` any username/full-name change;
+    ``("user", user_id)`` a single user's profile;
+    ``("dm_peers", user_id)`` a user's DM threads.
+    """
+
+    def __init__(self) -> None:
+        self.epoch = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._counters: dict[Hashable, int] = {}
+        self._bumped_at: dict[Hashable, float] = {}
+
+    def bump(self, *keys: Hashable) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+                self._bumped_at[key] = now
+
+    def bumped_within(self, seconds: float, *keys: Hashable) -> bool:
+        """Whether any of ``keys`` changed in the last ``seconds``."""
+        since = time.monotonic() - seconds
+        return any(self._bumped_at.get(key, 0.0) > since for key in keys)
+
+    def get(self, key: Hashable) -> int:
+        return self._counters.get(key, 0)
+
+    def etag(self, *keys: Hashable, params: tuple = ()) -> str:
+        state = repr(([(key, self.get(key)) for key in keys], params)).encode()
+        digest = hashlib.blake2b(state, digest_size=8).hexdigest()
+        return f'W/"{self.epoch}-{digest}"'
+
+
+versions = VersionStamps()
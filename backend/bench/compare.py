@@ -0,0 +1,53 @@
+"""Compare two ``bench.load`` result files and flag latency regressions.
+
+    python -m bench.compare baseline.json candidate.json --threshold 0.2
+
+Exits non-zero when any scenario's p99 grew by more than ``--threshold``
+(as a fraction of the baseline) or started reporting errors.
+"""
+
+import argparse
+import json
+import sys
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two load-test runs.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    with open(args.candidate, encoding="utf-8") as handle:
+        candidate = json.load(handle)
+
+    regressed = False
+    print(f"{'scenario':<12} {'p50 ms':>18} {'p99 ms':>18} {'req/s':>18}")
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        row = [
+            f"{before[field]:>8.1f} → {after[field]:<7.1f}"
+            for field in ("p50_ms", "p99_ms", "throughput_per_s")
+        ]
+        flag = ""
+        if before["p99_ms"] and after["p99_ms"] > before["p99_ms"] * (1 + args.threshold):
+            flag = "  REGRESSED"
+        if after["errors"] > before["errors"]:
+            flag += "  ERRORS"
+        regressed = regressed or bool(flag)
+        print(f"{name:<12} {' '.join(row)}{flag}")
+
+    memory_before = baseline.get("memory", {}).get("bytes_per_socket")
+    memory_after = candidate.get("memory", {}).get("bytes_per_socket")
+    if memory_before and memory_after:
+        print(f"bytes/socket {memory_before} → {memory_after}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Bytes per idle connection held by the WebSocket registry.
+
+Registers ``--connections`` placeholder sockets across ``--topics`` groups
+and DM threads and measures, with ``tracemalloc``, what the registry and its
+``Connection`` records add per socket. ``--legacy`` measures the layout the
+handlers used before the registry: a dict of WebSocket sets per manager plus
+the ORM ``User`` and ``Session`` every handler kept alive. The socket itself
+(uvicorn's protocol object and buffers) is the same either way and is
+covered by the RSS figures from ``bench.load``.
+
+Run from ``backend/``::
+
+    python -m bench.connections --connections 100000 --legacy
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from app import models
+from app.connections import Connection, ConnectionRegistry
+from app.database import SessionLocal
+
+
+class PlaceholderSocket:
+    __slots__ = ()
+
+
+def topic_for(rng: random.Random, topics: int, dm_share: float) -> tuple[str, int]:
+    if rng.random() < dm_share:
+        return "thread", rng.randrange(topics)
+    return "group", rng.randrange(topics)
+
+
+def measure(build) -> tuple[int, float, object]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    state = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, elapsed, state
+
+
+def build_registry(args, websockets: list) -> ConnectionRegistry:
+    rng = random.Random(42)
+    registry = ConnectionRegistry()
+    for index, websocket in enumerate(websockets):
+        kind, scope_id = topic_for(rng, args.topics, args.dm_share)
+        registry.add(Connection(websocket, index % args.users, kind, scope_id))
+    return registry
+
+
+def build_legacy(args, websockets: list) -> tuple:
+    rng = random.Random(42)
+    group_sockets: dict[int, set] = {}
+    thread_sockets: dict[int, set] = {}
+    handlers = []
+    for index, websocket in enumerate(websockets):
+        kind, scope_id = topic_for(rng, args.topics, args.dm_share)
+        target = thread_sockets if kind == "thread" else group_sockets
+        target.setdefault(scope_id, set()).add(websocket)
+        user_id = index % args.users
+        user = models.User(
+            id=user_id,
+            username=f"user{user_id:07d}",
+            full_name=f"User {user_id}",
+            email=f"user{user_id:07d}@example.com",
+            password_hash="$2b$12$" + "x" * 53,
+        )
+        handlers.append((SessionLocal(), user))
+    return group_sockets, thread_sockets, handlers
+
+
+def run_layout(args, build) -> dict:
+    websockets = [PlaceholderSocket() for _ in range(args.connections)]
+    used, elapsed, state = measure(lambda: build(args, websockets))
+    del state
+    return {
+        "bytes": used,
+        "bytes_per_connection": round(used / args.connections, 1),
+        "build_seconds": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure WebSocket registry memory.")
+    parser.add_argument("--connections", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--topics", type=int, default=5_000)
+    parser.add_argument("--dm-share", type=float, default=0.3)
+    parser.add_argument("--legacy", action="store_true", help="Also measure the old layout")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    report = {
+        "config": vars(args),
+        "python": sys.version.split()[0],
+        "registry": run_layout(args, build_registry),
+    }
+    if args.legacy:
+        report["legacy"] = run_layout(args, build_legacy)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
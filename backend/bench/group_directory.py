@@ -0,0 +1,129 @@
+"""Compare the legacy full group listing with the paginated directory query.
+
+Run from ``backend/``::
+
+    python -m bench.group_directory --groups 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+
+
+def seed(session, group_count: int, membership_ratio: float) -> int:
+    user = models.User(
+        username="bench",
+        full_name="Bench User",
+        email="bench@example.com",
+        password_hash="x",
+    )
+    session.add(user)
+    session.commit()
+
+    rng = random.Random(42)
+    batch = 5000
+    for start in range(0, group_count, batch):
+        # Mixed case, so the lowercase prefix below relies on name_key.
+        names = [
+            f"Group-{rng.randrange(10**8):08d}-{index}"
+            for index in range(start, min(start + batch, group_count))
+        ]
+        rows = [
+            {
+                "name": name,
+                "name_key": crud.group_name_key(name),
+                "description": None,
+                "created_by": user.id,
+            }
+            for name in names
+        ]
+        session.execute(insert(models.Group), rows)
+    session.commit()
+
+    member_rows = [
+        {"group_id": group_id, "user_id": user.id, "role": "member"}
+        for group_id in range(1, group_count + 1)
+        if rng.random() < membership_ratio
+    ]
+    for start in range(0, len(member_rows), batch):
+        session.execute(insert(models.GroupMember), member_rows[start : start + batch])
+    session.commit()
+    return user.id
+
+
+def legacy_listing(session, user_id: int) -> int:
+    groups = session.query(models.Group).all()
+    member_ids = {
+        membership.group_id
+        for membership in session.query(models.GroupMember)
+        .filter(models.GroupMember.user_id == user_id)
+        .all()
+    }
+    return len([(group, group.id in member_ids) for group in groups])
+
+
+def directory_page(session, user_id: int, prefix: str | None, limit: int) -> int:
+    rows = crud.list_all_groups(session, user_id, prefix=prefix, limit=limit + 1)
+    return len(rows)
+
+
+def timed(fn, repeat: int) -> dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "rows": rows,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--groups", type=int, default=100_000)
+    parser.add_argument("--membership-ratio", type=float, default=0.01)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        try:
+            user_id = seed(session, args.groups, args.membership_ratio)
+            results = {
+                "legacy_full_listing": timed(
+                    lambda: legacy_listing(session, user_id), args.repeat
+                ),
+                "directory_first_page": timed(
+                    lambda: directory_page(session, user_id, None, args.limit), args.repeat
+                ),
+                "directory_prefix_page": timed(
+                    lambda: directory_page(session, user_id, "group-12", args.limit),
+                    args.repeat,
+                ),
+            }
+        finally:
+            session.close()
+            engine.dispose()
+
+    print(f"groups={args.groups} limit={args.limit}")
+    for name, stats in results.items():
+        print(f"{name:24} {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Offline load test for the REST and WebSocket paths.
+
+Seeds a fresh SQLite database of configurable size, starts the API under
+uvicorn on localhost, then measures:
+
+- ``login``: ``POST /auth/login`` (bcrypt-bound)
+- ``history``: ``GET /groups/{id}/messages``
+- ``directory``: ``GET /groups/directory`` (first page)
+- ``post``: ``POST /groups/{id}/messages`` and ``POST /dm/with/{user}/messages``
+- ``delivery``: time from a post being sent until each WebSocket client
+  subscribed to that group or DM thread receives it
+
+Results, including server RSS before and after the sockets connect, are
+printed (or written with ``--output``) as JSON; compare two runs with
+``python -m bench.compare``. Run from ``backend/``::
+
+    pip install -r bench/requirements.txt
+    python -m bench.load --users 2000 --groups 50 --ws-clients 2000 --output run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+BENCH_PASSWORD = "bench-password"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+
+def seed(args) -> dict:
+    """Populate the database named by ``DATABASE_URL``; return the layout."""
+    from sqlalchemy import insert, update
+
+    from app import auth, crud, models
+    from app.bulk_import import import_messages
+    from app.database import SessionLocal
+    from app.migrate import upgrade_all
+
+    upgrade_all()
+    db = SessionLocal()
+    try:
+        password_hash = auth.hash_password(BENCH_PASSWORD)
+        db.execute(
+            insert(models.User),
+            [
+                {
+                    "username": f"user{index}",
+                    "full_name": f"Bench User {index}",
+                    "email": f"user{index}@bench.local",
+                    "password_hash": password_hash,
+                }
+                for index in range(args.users)
+            ],
+        )
+        user_ids = dict(db.query(models.User.username, models.User.id).all())
+
+        group_names = [f"bench-{index:05d}" for index in range(args.groups)]
+        db.execute(
+            insert(models.Group),
+            [
+                {
+                    "name": name,
+                    "name_key": crud.group_name_key(name),
+                    "created_by": user_ids["user0"],
+                }
+                for name in group_names
+            ],
+        )
+        group_ids = [group_id for (group_id,) in db.query(models.Group.id).order_by(models.Group.id)]
+
+        user_groups = {f"user{index}": group_ids[index % len(group_ids)] for index in range(args.users)}
+        db.execute(
+            insert(models.GroupMember),
+            [
+                {"group_id": group_id, "user_id": user_ids[username], "role": "member"}
+                for username, group_id in user_groups.items()
+            ],
+        )
+        for group_id in group_ids:
+            db.execute(
+                update(models.Group)
+                .where(models.Group.id == group_id)
+                .values(
+                    member_count=db.query(models.GroupMember)
+                    .filter(models.GroupMember.group_id == group_id)
+                    .count()
+                )
+            )
+
+        dm_pairs = [(f"user{2 * index}", f"user{2 * index + 1}") for index in range(args.dm_pairs)]
+        db.execute(
+            insert(models.DirectThread),
+            [
+                {
+                    "user_a_id": min(user_ids[a], user_ids[b]),
+                    "user_b_id": max(user_ids[a], user_ids[b]),
+                }
+                for a, b in dm_pairs
+            ],
+        )
+        db.commit()
+
+        senders: dict[int, str] = {}
+        for username, group_id in user_groups.items():
+            senders.setdefault(group_id, username)
+
+        def history_lines():
+            for index in range(args.messages_per_group * len(group_ids)):
+                group_id = group_ids[index % len(group_ids)]
+                yield json.dumps(
+                    {
+                        "group_id": group_id,
+                        "sender_username": senders.get(group_id, "user0"),
+                        "content": f"seed message {index}",
+                    }
+                )
+
+        import_messages(db, "group", history_lines())
+    finally:
+        db.close()
+
+    return {"user_groups": user_groups, "group_ids": group_ids, "dm_pairs": dm_pairs}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+async def wait_until_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{base_url}/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start in time")
+
+
+async def run_requests(count: int, concurrency: int, make_request) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await make_request(index)
+                if response.status_code >= 400:
+                    errors += 1
+                    return
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_benchmark(args, layout: dict, base_url: str, server_pid: int) -> dict:
+    from app import auth
+
+    user_groups = layout["user_groups"]
+    usernames = list(user_groups)
+    tokens = {name: auth.create_access_token({"sub": name}) for name in usernames}
+
+    def headers(username: str) -> dict:
+        return {"Authorization": f"Bearer {tokens[username]}"}
+
+    results: dict = {"scenarios": {}, "memory": {}}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        results["scenarios"]["login"] = await run_requests(
+            args.logins,
+            args.concurrency,
+            lambda i: client.post(
+                "/auth/login",
+                data={"username": usernames[i % len(usernames)], "password": BENCH_PASSWORD},
+            ),
+        )
+        results["scenarios"]["history"] = await run_requests(
+            args.requests,
+            args.concurrency,
+            lambda i: client.get(
+                f"/groups/{user_groups[usernames[i % len(usernames)]]}/messages",
+                headers=headers(usernames[i % len(usernames)]),
+            ),
+        )
+        results["scenarios"]["directory"] = await run_requests(
+            args.requests,
+            args.concurrency,
+            lambda i: client.get(
+                "/groups/directory", headers=headers(usernames[i % len(usernames)])
+            ),
+        )
+
+        results["memory"]["rss_before_sockets"] = read_rss_bytes(server_pid)
+
+        # Socket i listens on user i's group, except every tenth which joins a DM.
+        ws_base = base_url.replace("http", "ws", 1)
+        dm_pairs = layout["dm_pairs"]
+        subscriptions: dict[tuple[str, object], int] = {}
+        delivery: list[float] = []
+        sockets = []
+        for index in range(args.ws_clients):
+            username = usernames[index % len(usernames)]
+            if dm_pairs and index % 10 == 0:
+                a, b = dm_pairs[(index // 10) % len(dm_pairs)]
+                url = f"{ws_base}/ws/dm/{b}?token={tokens[a]}"
+                scope = ("dm", tuple(sorted((a, b))))
+            else:
+                url = f"{ws_base}/ws/groups/{user_groups[username]}?token={tokens[username]}"
+                scope = ("group", user_groups[username])
+            try:
+                sockets.append(await websockets.connect(url, max_queue=None, open_timeout=60))
+            except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as exc:
+                # Record where the server stopped accepting sockets and carry on
+                # with the ones that did connect.
+                results["memory"]["ws_connect_error"] = f"after {len(sockets)} sockets: {exc}"
+                break
+            subscriptions[scope] = subscriptions.get(scope, 0) + 1
+
+        results["memory"]["rss_after_sockets"] = read_rss_bytes(server_pid)
+        results["memory"]["ws_clients"] = len(sockets)
+        results["memory"]["ws_clients_requested"] = args.ws_clients
+        if sockets:
+            results["memory"]["bytes_per_socket"] = round(
+                (results["memory"]["rss_after_sockets"] - results["memory"]["rss_before_sockets"])
+                / len(sockets)
+            )
+
+        async def listen(ws) -> None:
+            try:
+                async for raw in ws:
+                    payload = json.loads(raw)
+                    content = payload.get("data", {}).get("content", "")
+                    if content.startswith("bench "):
+                        delivery.append(time.perf_counter() - float(content.split()[1]))
+            except websockets.ConnectionClosed:
+                pass
+
+        listeners = [asyncio.create_task(listen(ws)) for ws in sockets]
+
+        expected = 0
+        post_targets = []
+        group_senders = {}
+        for username, group_id in user_groups.items():
+            group_senders.setdefault(group_id, username)
+        group_scopes = [scope for scope in subscriptions if scope[0] == "group"]
+        dm_scopes = [scope for scope in subscriptions if scope[0] == "dm"]
+        for index in range(args.posts):
+            if dm_scopes and index % 10 == 0:
+                scope = dm_scopes[index % len(dm_scopes)]
+                sender, recipient = scope[1]
+                post_targets.append((sender, f"/dm/with/{recipient}/messages"))
+            elif group_scopes:
+                scope = group_scopes[index % len(group_scopes)]
+                post_targets.append((group_senders[scope[1]], f"/groups/{scope[1]}/messages"))
+            else:
+                continue
+            expected += subscriptions[scope]
+
+        started = time.perf_counter()
+        results["scenarios"]["post"] = await run_requests(
+            len(post_targets),
+            args.concurrency,
+            lambda i: client.post(
+                post_targets[i][1],
+                json={"content": f"bench {time.perf_counter()}"},
+                headers=headers(post_targets[i][0]),
+            ),
+        )
+        deadline = time.perf_counter() + args.delivery_timeout
+        while len(delivery) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        results["scenarios"]["delivery"] = summarize(
+            delivery, expected - len(delivery), time.perf_counter() - started
+        )
+
+        results["memory"]["rss_end"] = read_rss_bytes(server_pid)
+        for ws in sockets:
+            await ws.close()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the chat API.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--dm-pairs", type=int, default=50)
+    parser.add_argument("--messages-per-group", type=int, default=200)
+    parser.add_argument("--ws-clients", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delivery-timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "ARCHIVE_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'archive.db')}",
+            "USER_MESSAGE_RATE": "0",
+            "SCOPE_MESSAGE_RATE": "0",
+        }
+        os.environ.update(env)
+
+        seed_started = time.perf_counter()
+        layout = seed(args)
+        seed_seconds = time.perf_counter() - seed_started
+
+        port = free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app.main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "warning",
+            ],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            results = asyncio.run(run_benchmark(args, layout, base_url, server.pid))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "config": vars(args),
+        "seed_seconds": round(seed_seconds, 3),
+        "python": sys.version.split()[0],
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
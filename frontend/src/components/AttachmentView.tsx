@@ -0,0 +1,100 @@
+import { ArrowDownTrayIcon } from '@heroicons/react/24/outline'
+import { useEffect, useState } from 'react'
+import { fetchAttachment, type Attachment } from '../utils/api'
+
+type AttachmentViewProps = {
+  token: string
+  attachment: Attachment
+  isMe: boolean
+}
+
+function formatSize(size: number) {
+  if (size < 1024) {
+    return `${size} B`
+  }
+  if (size < 1024 * 1024) {
+    return `${(size / 1024).toFixed(1)} KB`
+  }
+  return `${(size / (1024 * 1024)).toFixed(1)} MB`
+}
+
+// Files sit behind the bearer token, so they are fetched as blobs rather than
+// linked directly; only the thumbnail is loaded until the user asks for more.
+function AttachmentView({ token, attachment, isMe }: AttachmentViewProps) {
+  const [previewUrl, setPreviewUrl] = useState<string | null>(null)
+  const [isDownloading, setIsDownloading] = useState(false)
+  const [downloadFailed, setDownloadFailed] = useState(false)
+
+  useEffect(() => {
+    if (!attachment.has_thumbnail) {
+      return
+    }
+
+    let url: string | null = null
+    let cancelled = false
+    fetchAttachment(token, attachment, true)
+      .then((blob) => {
+        if (!cancelled) {
+          url = URL.createObjectURL(blob)
+          setPreviewUrl(url)
+        }
+      })
+      .catch(() => {
+        // The download button below still works without a preview.
+      })
+
+    return () => {
+      cancelled = true
+      if (url) {
+        URL.revokeObjectURL(url)
+      }
+    }
+  }, [attachment, token])
+
+  const handleDownload = async () => {
+    setIsDownloading(true)
+    setDownloadFailed(false)
+    try {
+      const url = URL.createObjectURL(await fetchAttachment(token, attachment))
+      const link = document.createElement('a')
+      link.href = url
+      link.download = attachment.filename
+      link.click()
+      window.setTimeout(() => URL.revokeObjectURL(url), 0)
+    } catch {
+      setDownloadFailed(true)
+    } finally {
+      setIsDownloading(false)
+    }
+  }
+
+  return (
+    <div className="flex flex-col gap-2">
+      {previewUrl ? (
+        <img
+          src={previewUrl}
+          alt={attachment.filename}
+          className="max-h-60 max-w-full cursor-pointer rounded-lg"
+          onClick={handleDownload}
+        />
+      ) : null}
+      <button
+        type="button"
+        onClick={handleDownload}
+        disabled={isDownloading}
+        className={`flex items-center gap-2 rounded-lg border px-2 py-1 text-left text-xs ${isMe
+          ? 'border-blue-400 text-blue-50 hover:bg-blue-500'
+          : 'border-slate-200 text-slate-600 hover:bg-slate-50'
+          } disabled:opacity-50`}
+      >
+        <ArrowDownTrayIcon className="h-4 w-4 shrink-0" />
+        <span className="min-w-0 truncate font-semibold">{attachment.filename}</span>
+        <span className="shrink-0 opacity-70">
+          {downloadFailed ? 'Failed, retry' : formatSize(attachment.size)}
+        </span>
+      </button>
+    </div>
+  )
+}
+
+export default AttachmentView
@@ -1,16 +1,39 @@
-import { PaperAirplaneIcon } from '@heroicons/react/24/outline'
+import { PaperAirplaneIcon, PaperClipIcon } from '@heroicons/react/24/outline'
+import { useRef } from 'react'
 
 type ComposerProps = {
   value: string
   disabled: boolean
   onChange: (value: string) => void
   onSubmit: (event: React.FormEvent<HTMLFormElement>) => void
+  onAttach: (file: File) => void
 }
 
-function Composer({ value, disabled, onChange, onSubmit }: ComposerProps) {
+function Composer({ value, disabled, onChange, onSubmit, onAttach }: ComposerProps) {
+  const fileInputRef = useRef<HTMLInputElement | null>(null)
+
+  const handleFileChange = (event: React.ChangeEvent<HTMLInputElement>) => {
+    const file = event.target.files?.[0]
+    // Cleared so picking the same file again still fires a change.
+    event.target.value = ''
+    if (file) {
+      onAttach(file)
+    }
+  }
+
   return (
     <div className="border-t border-blue-200 px-8 py-5">
       <form className="flex items-center gap-3" onSubmit={onSubmit}>
+        <input ref={fileInputRef} type="file" className="hidden" onChange={handleFileChange} />
+        <button
+          type="button"
+          onClick={() => fileInputRef.current?.click()}
+          className="rounded-md border border-blue-300 bg-white p-2 text-blue-600 hover:bg-blue-50"
+          disabled={disabled}
+          aria-label="Attach a file"
+        >
+          <PaperClipIcon className="h-4 w-4" />
+        </button>
         <input
           type="text"
           placeholder="Type your message"
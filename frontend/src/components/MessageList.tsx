@@ -1,5 +1,6 @@
 import { CheckIcon } from '@heroicons/react/16/solid'
-import type { User } from '../utils/api'
+import type { Attachment, User } from '../utils/api'
+import AttachmentView from './AttachmentView'
 import { formatDayLabel, formatRelativeTime, isSameDay } from '../utils/date'
 
 type ChatMessage = {
@@ -8,22 +9,29 @@ type ChatMessage = {
   sender_username: string
   sender_name: string
   content: string
+  attachment?: Attachment | null
   created_at: string
 }
 
 type MessageListProps = {
+  token: string
   messages: ChatMessage[]
   me: User | null
   showSenderLabel?: boolean
 }
 
-function MessageList({ messages, me, showSenderLabel = true }: MessageListProps) {
+function MessageList({ token, messages, me, showSenderLabel = true }: MessageListProps) {
   return (
     <div className="flex flex-col gap-3">
       {messages.map((message, index) => {
         const isMe = message.user_id === me?.id
         const showSender = index === 0 || messages[index - 1].user_id !== message.user_id
         const senderLabel = message.sender_name || message.sender_username
+        // The server captions a bare upload with its filename; don't repeat it.
+        const text =
+          message.attachment && message.content === message.attachment.filename
+            ? ''
+            : message.content
 
         const prevMessage = index > 0 ? messages[index - 1] : null
         const showDaySeparator = !prevMessage || !isSameDay(prevMessage.created_at, message.created_at)
@@ -51,9 +59,14 @@ function MessageList({ messages, me, showSenderLabel = true }: MessageListProps)
                   : 'border-slate-200 bg-white text-slate-800'
                   }`}
               >
+                {message.attachment ? (
+                  <div className="mb-1">
+                    <AttachmentView token={token} attachment={message.attachment} isMe={isMe} />
+                  </div>
+                ) : null}
                 <div className="flex flex-wrap items-end justify-between gap-x-4 gap-y-1">
                   <div className="min-w-0 flex-1 break-words">
-                    {message.content.split(/(https?:\/\/[^\s]+|(?:[a-z0-9-]+\.)+[a-z]{2,}(?:\/[^\s]*)?)/gi).map((part, i) => {
+                    {text.split(/(https?:\/\/[^\s]+|(?:[a-z0-9-]+\.)+[a-z]{2,}(?:\/[^\s]*)?)/gi).map((part, i) => {
                       const isFullUrl = /^https?:\/\//i.test(part)
                       const isDomainUrl = /^[a-z0-9-]+\.[a-z]{2,}/i.test(part)
 
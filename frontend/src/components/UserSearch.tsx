@@ -0,0 +1,46 @@
+import type { DirectUser } from '../utils/api'
+
+type UserSearchProps = {
+  query: string
+  results: DirectUser[]
+  onQueryChange: (query: string) => void
+  onSelect: (user: DirectUser) => void
+}
+
+function UserSearch({ query, results, onQueryChange, onSelect }: UserSearchProps) {
+  return (
+    <div className="flex flex-col gap-2">
+      <input
+        type="search"
+        value={query}
+        onChange={(event) => onQueryChange(event.target.value)}
+        placeholder="Search people"
+        className="rounded-md border border-blue-200 px-3 py-2 text-base lg:text-sm focus:border-blue-500 focus:outline-none"
+      />
+      {query.trim() && results.length === 0 ? (
+        <p className="text-xs text-slate-500">No matching users.</p>
+      ) : null}
+      {results.map((user) => {
+        const displayName = user.full_name || user.username
+        return (
+          <button
+            key={user.id}
+            type="button"
+            onClick={() => onSelect(user)}
+            className="flex items-center gap-3 rounded-lg border border-blue-200 bg-white/90 px-3 py-2 text-left text-sm text-slate-700 hover:bg-blue-100"
+          >
+            <span className="grid h-8 w-8 place-items-center rounded-full bg-blue-200 text-xs font-semibold text-blue-800">
+              {displayName[0]?.toUpperCase()}
+            </span>
+            <div className="flex flex-col">
+              <span className="font-semibold">{displayName}</span>
+              <span className="text-[10px] text-slate-400">@{user.username}</span>
+            </div>
+          </button>
+        )
+      })}
+    </div>
+  )
+}
+
+export default UserSearch
@@ -1,12 +1,27 @@
 import type { Group } from '../../utils/api'
+import AdminGroupSearch from './AdminGroupSearch'
 
 type AdminGroupListProps = {
   groups: Group[]
+  query: string
+  hasMore: boolean
+  isLoadingMore: boolean
+  onQueryChange: (query: string) => void
+  onLoadMore: () => void
   onEdit: (group: Group) => void
   onDelete: (group: Group) => void
 }
 
-function AdminGroupList({ groups, onEdit, onDelete }: AdminGroupListProps) {
+function AdminGroupList({
+  groups,
+  query,
+  hasMore,
+  isLoadingMore,
+  onQueryChange,
+  onLoadMore,
+  onEdit,
+  onDelete,
+}: AdminGroupListProps) {
   return (
     <div className="rounded-2xl border border-slate-200 bg-white p-6 shadow-[0_20px_50px_rgba(15,23,42,0.08)]">
       <div className="flex items-center justify-between">
@@ -15,36 +30,46 @@ function AdminGroupList({ groups, onEdit, onDelete }: AdminGroupListProps) {
           Groups
         </p>
       </div>
-      <ul className="mt-4 space-y-3 text-sm text-slate-600">
-        {groups.map((group) => (
-          <li key={group.id} className="rounded-lg border border-slate-200 bg-slate-50 p-3">
-            <div className="flex items-center justify-between gap-4">
-              <div>
-                <p className="font-semibold text-slate-800">{group.name}</p>
-                <p className="text-xs text-slate-500">
-                  {group.description || 'No description'}
-                </p>
-              </div>
-              <div className="flex items-center gap-2">
-                <button
-                  type="button"
-                  className="text-xs font-semibold text-emerald-700"
-                  onClick={() => onEdit(group)}
-                >
-                  Edit
-                </button>
-                <button
-                  type="button"
-                  className="text-xs font-semibold text-red-600"
-                  onClick={() => onDelete(group)}
-                >
-                  Delete
-                </button>
-              </div>
-            </div>
-          </li>
-        ))}
-      </ul>
+      <div className="mt-4">
+        <AdminGroupSearch
+          query={query}
+          hasMore={hasMore}
+          isLoading={isLoadingMore}
+          onQueryChange={onQueryChange}
+          onLoadMore={onLoadMore}
+        >
+          <ul className="space-y-3 text-sm text-slate-600">
+            {groups.map((group) => (
+              <li key={group.id} className="rounded-lg border border-slate-200 bg-slate-50 p-3">
+                <div className="flex items-center justify-between gap-4">
+                  <div>
+                    <p className="font-semibold text-slate-800">{group.name}</p>
+                    <p className="text-xs text-slate-500">
+                      {group.description || 'No description'}
+                    </p>
+                  </div>
+                  <div className="flex items-center gap-2">
+                    <button
+                      type="button"
+                      className="text-xs font-semibold text-emerald-700"
+                      onClick={() => onEdit(group)}
+                    >
+                      Edit
+                    </button>
+                    <button
+                      type="button"
+                      className="text-xs font-semibold text-red-600"
+                      onClick={() => onDelete(group)}
+                    >
+                      Delete
+                    </button>
+                  </div>
+                </div>
+              </li>
+            ))}
+          </ul>
+        </AdminGroupSearch>
+      </div>
     </div>
   )
 }
@@ -0,0 +1,43 @@
+type AdminGroupSearchProps = {
+  query: string
+  hasMore: boolean
+  isLoading: boolean
+  onQueryChange: (query: string) => void
+  onLoadMore: () => void
+  children: React.ReactNode
+}
+
+// Search box and "load more" around one page-at-a-time group list.
+function AdminGroupSearch({
+  query,
+  hasMore,
+  isLoading,
+  onQueryChange,
+  onLoadMore,
+  children,
+}: AdminGroupSearchProps) {
+  return (
+    <div className="flex flex-col gap-3">
+      <input
+        type="search"
+        value={query}
+        onChange={(event) => onQueryChange(event.target.value)}
+        placeholder="Search groups by name"
+        className="rounded-md border border-slate-200 px-3 py-2 text-sm focus:border-emerald-500 focus:outline-none"
+      />
+      {children}
+      {hasMore ? (
+        <button
+          type="button"
+          onClick={onLoadMore}
+          disabled={isLoading}
+          className="self-center rounded-md border border-slate-200 bg-white px-3 py-1 text-xs font-semibold text-slate-600 hover:bg-slate-50 disabled:opacity-50"
+        >
+          {isLoading ? 'Loading...' : 'Load more groups'}
+        </button>
+      ) : null}
+    </div>
+  )
+}
+
+export default AdminGroupSearch
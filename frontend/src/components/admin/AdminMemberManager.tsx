@@ -1,9 +1,20 @@
 import type { Group, UserSummary } from '../../utils/api'
+import AdminGroupSearch from './AdminGroupSearch'
 
 type AdminMemberManagerProps = {
   groups: Group[]
+  groupQuery: string
+  hasMoreGroups: boolean
+  isLoadingGroups: boolean
+  onGroupQueryChange: (query: string) => void
+  onLoadMoreGroups: () => void
   selectedGroupId: number | null
   members: UserSummary[]
+  memberQuery: string
+  hasMoreMembers: boolean
+  isLoadingMembers: boolean
+  onMemberQueryChange: (query: string) => void
+  onLoadMoreMembers: () => void
   isLoading: boolean
   currentUserId: number | null
   onSelectGroup: (groupId: number) => void
@@ -12,8 +23,18 @@ type AdminMemberManagerProps = {
 
 function AdminMemberManager({
   groups,
+  groupQuery,
+  hasMoreGroups,
+  isLoadingGroups,
+  onGroupQueryChange,
+  onLoadMoreGroups,
   selectedGroupId,
   members,
+  memberQuery,
+  hasMoreMembers,
+  isLoadingMembers,
+  onMemberQueryChange,
+  onLoadMoreMembers,
   isLoading,
   currentUserId,
   onSelectGroup,
@@ -30,28 +51,45 @@ function AdminMemberManager({
       <div className="mt-4 grid gap-3 md:grid-cols-[220px_1fr]">
         <div className="flex flex-col gap-2">
           <p className="text-xs font-semibold text-slate-500">Select group</p>
-          <div className="flex flex-col gap-2">
-            {groups.map((group) => (
-              <button
-                key={group.id}
-                type="button"
-                onClick={() => onSelectGroup(group.id)}
-                className={`rounded-md border px-3 py-2 text-left text-xs font-semibold transition ${
-                  selectedGroupId === group.id
-                    ? 'border-emerald-400 bg-emerald-50 text-slate-900'
-                    : 'border-slate-200 bg-white text-slate-600 hover:border-emerald-200 hover:bg-emerald-50/40'
-                }`}
-              >
-                {group.name}
-              </button>
-            ))}
-          </div>
+          <AdminGroupSearch
+            query={groupQuery}
+            hasMore={hasMoreGroups}
+            isLoading={isLoadingGroups}
+            onQueryChange={onGroupQueryChange}
+            onLoadMore={onLoadMoreGroups}
+          >
+            <div className="flex flex-col gap-2">
+              {groups.map((group) => (
+                <button
+                  key={group.id}
+                  type="button"
+                  onClick={() => onSelectGroup(group.id)}
+                  className={`rounded-md border px-3 py-2 text-left text-xs font-semibold transition ${
+                    selectedGroupId === group.id
+                      ? 'border-emerald-400 bg-emerald-50 text-slate-900'
+                      : 'border-slate-200 bg-white text-slate-600 hover:border-emerald-200 hover:bg-emerald-50/40'
+                  }`}
+                >
+                  {group.name}
+                </button>
+              ))}
+            </div>
+          </AdminGroupSearch>
         </div>
         <div className="rounded-lg border border-slate-200 bg-slate-50 p-4">
           {selectedGroupId ? (
             <div className="flex flex-col gap-3">
+              <input
+                type="search"
+                value={memberQuery}
+                onChange={(event) => onMemberQueryChange(event.target.value)}
+                placeholder="Search members by name"
+                className="rounded-md border border-slate-200 px-3 py-2 text-sm focus:border-emerald-500 focus:outline-none"
+              />
               {members.length === 0 ? (
-                <p className="text-xs text-slate-500">No members yet.</p>
+                <p className="text-xs text-slate-500">
+                  {memberQuery.trim() ? 'No matching members.' : 'No members yet.'}
+                </p>
               ) : null}
               {members.map((member) => (
                 <div
@@ -85,6 +123,16 @@ function AdminMemberManager({
                   </button>
                 </div>
               ))}
+              {hasMoreMembers ? (
+                <button
+                  type="button"
+                  onClick={onLoadMoreMembers}
+                  disabled={isLoadingMembers}
+                  className="self-center rounded-md border border-slate-200 bg-white px-3 py-1 text-xs font-semibold text-slate-600 hover:bg-slate-50 disabled:opacity-50"
+                >
+                  {isLoadingMembers ? 'Loading...' : 'Load more members'}
+                </button>
+              ) : null}
             </div>
           ) : (
             <p className="text-xs text-slate-500">Choose a group to manage.</p>
@@ -14,6 +14,7 @@ import JoinModal from '../components/JoinModal'
 import MessageList from '../components/MessageList'
 import AllChatsList from '../components/AllChatsList'
 import ProfileModal from '../components/ProfileModal'
+import UserSearch from '../components/UserSearch'
 import { Toast } from '../components/Toast'
 import { useAuth } from '../hooks/useAuth'
 import { useDirectMessages } from '../hooks/useDirectMessages'
@@ -21,8 +22,13 @@ import { useDirectUsers } from '../hooks/useDirectUsers'
 import { useGroups } from '../hooks/useGroups'
 import { useMembers } from '../hooks/useMembers'
 import { useMessages } from '../hooks/useMessages'
+import { usePresence } from '../hooks/usePresence'
+import { useUserSearch } from '../hooks/useUserSearch'
 import { getUserByUsername, updateMe, type DirectUser } from '../utils/api'
 
+// DM sockets carry no presence frames; DMs rely on the polled snapshot alone.
+const NO_PRESENCE_UPDATES: Record<number, boolean> = {}
+
 interface GroupChatContainerProps {
   initialGroupId?: number | null
   initialUsername?: string | null
@@ -93,6 +99,10 @@ function GroupChatContainer({
 
   const {
     groups,
+    groupQuery,
+    setGroupQuery,
+    hasMoreGroups,
+    loadMoreGroups,
     selectedGroupId,
     selectedGroup,
     joinTarget,
@@ -112,27 +122,114 @@ function GroupChatContainer({
     }
   }
 
-  const { members } = useMembers(token, selectedGroup, handleError)
-  const { messages, messageText, setMessageText, send } = useMessages(
+  const {
+    members,
+    memberCount,
+    hasMore: hasMoreMembers,
+    loadMore: loadMoreMembers,
+  } = useMembers(token, selectedGroup?.is_member ? selectedGroup.id : null, handleError)
+  const {
+    messages,
+    messageText,
+    setMessageText,
+    send,
+    sendFile,
+    hasOlder: hasOlderMessages,
+    loadOlder: loadOlderMessages,
+    onlineUpdates,
+    typingUserIds,
+    notifyTyping,
+  } = useMessages(
     token,
     selectedGroupId,
     selectedGroup?.is_member,
     handleError,
   )
   const { users: directUsers, refresh: refreshDirectUsers } = useDirectUsers(token, handleError)
+  const {
+    query: userSearchQuery,
+    setQuery: setUserSearchQuery,
+    results: userSearchResults,
+  } = useUserSearch(token, handleError)
   const {
     messages: directMessages,
     messageText: directMessageText,
     setMessageText: setDirectMessageText,
     send: sendDirectMessage,
+    sendFile: sendDirectFile,
+    hasOlder: hasOlderDirectMessages,
+    loadOlder: loadOlderDirectMessages,
+    typingUserIds: directTypingUserIds,
+    notifyTyping: notifyDirectTyping,
   } = useDirectMessages(token, selectedDmUser, handleError, () => {
     refreshDirectUsers()
   })
   const messageScrollRef = useRef<HTMLDivElement | null>(null)
+  // Distance from the bottom to restore after older messages are prepended.
+  const olderScrollAnchorRef = useRef<number | null>(null)
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false)
 
   const activeMembers = members.filter((member) => !member.is_banned)
+  // Members are paged, so the count comes from the server, not the list.
+  const groupMemberCount = selectedGroup?.is_member
+    ? memberCount
+    : selectedGroup?.member_count ?? 0
 
   const activeMessages = activeChat === 'dm' ? directMessages : messages
+  const online = usePresence(
+    token,
+    activeChat === 'dm'
+      ? selectedDmUser
+        ? [selectedDmUser.id]
+        : []
+      : activeMembers.map((member) => member.user_id),
+    activeChat === 'dm' ? NO_PRESENCE_UPDATES : onlineUpdates,
+  )
+  const typingNames = (activeChat === 'dm' ? directTypingUserIds : typingUserIds)
+    .filter((userId) => userId !== me?.id)
+    .map((userId) => {
+      if (activeChat === 'dm') {
+        return selectedDmUser?.full_name || selectedDmUser?.username || 'Someone'
+      }
+      const member = members.find((item) => item.user_id === userId)
+      return member ? member.full_name || member.username : 'Someone'
+    })
+  const typingLabel =
+    typingNames.length === 0
+      ? ''
+      : typingNames.length === 1
+        ? `${typingNames[0]} is typing...`
+        : typingNames.length === 2
+          ? `${typingNames[0]} and ${typingNames[1]} are typing...`
+          : 'Several people are typing...'
+  const hasOlderActiveMessages = activeChat === 'dm' ? hasOlderDirectMessages : hasOlderMessages
+
+  const handleLoadOlder = async () => {
+    const container = messageScrollRef.current
+    olderScrollAnchorRef.current = container ? container.scrollHeight - container.scrollTop : null
+    setIsLoadingOlder(true)
+    try {
+      const added = await (activeChat === 'dm' ? loadOlderDirectMessages() : loadOlderMessages())
+      if (added === 0) {
+        olderScrollAnchorRef.current = null
+      }
+    } finally {
+      setIsLoadingOlder(false)
+    }
+  }
+
+  const olderMessagesButton = hasOlderActiveMessages ? (
+    <div className="flex justify-center pb-3">
+      <button
+        type="button"
+        onClick={handleLoadOlder}
+        disabled={isLoadingOlder}
+        className="rounded-full border border-slate-200 bg-white px-3 py-1 text-xs font-semibold text-slate-600 hover:bg-slate-50 disabled:opacity-50"
+      >
+        {isLoadingOlder ? 'Loading...' : 'Load older messages'}
+      </button>
+    </div>
+  ) : null
 
   useEffect(() => {
     if (!token || !initialUsername) {
@@ -222,6 +319,14 @@ function GroupChatContainer({
       return
     }
 
+    if (olderScrollAnchorRef.current !== null) {
+      // Older messages were prepended: keep the same messages in view.
+      messageScrollRef.current.scrollTop =
+        messageScrollRef.current.scrollHeight - olderScrollAnchorRef.current
+      olderScrollAnchorRef.current = null
+      return
+    }
+
     messageScrollRef.current.scrollTo({
       top: messageScrollRef.current.scrollHeight,
       behavior: 'auto',
@@ -240,7 +345,7 @@ function GroupChatContainer({
   const headerSubtitle =
     activeChat === 'dm'
       ? selectedDmUser
-        ? `@${selectedDmUser.username}`
+        ? `@${selectedDmUser.username}${online[selectedDmUser.id] ? ' · online' : ''}`
         : ''
       : bannedNotice
         ? 'You are banned from this group.'
@@ -254,6 +359,27 @@ function GroupChatContainer({
     setMobileView('chat')
   }
 
+  // Directory pages are fetched as the group list nears its end.
+  const handleListScroll = (event: React.UIEvent<HTMLDivElement>) => {
+    if (leftTab === 'users' || !hasMoreGroups) {
+      return
+    }
+    const list = event.currentTarget
+    if (list.scrollHeight - list.scrollTop - list.clientHeight < 200) {
+      loadMoreGroups()
+    }
+  }
+
+  const handleMemberListScroll = (event: React.UIEvent<HTMLDivElement>) => {
+    if (!hasMoreMembers) {
+      return
+    }
+    const list = event.currentTarget
+    if (list.scrollHeight - list.scrollTop - list.clientHeight < 200) {
+      loadMoreMembers()
+    }
+  }
+
   const handleToggleInfo = () => {
     setIsInfoOpen((prev) => {
       const next = !prev
@@ -302,6 +428,17 @@ function GroupChatContainer({
   const setActiveMessageText =
     activeChat === 'dm' ? setDirectMessageText : setMessageText
   const sendActiveMessage = activeChat === 'dm' ? sendDirectMessage : send
+  const sendActiveFile = activeChat === 'dm' ? sendDirectFile : sendFile
+  const handleComposerChange = (value: string) => {
+    setActiveMessageText(value)
+    if (value.trim()) {
+      if (activeChat === 'dm') {
+        notifyDirectTyping()
+      } else {
+        notifyTyping()
+      }
+    }
+  }
   const isComposerDisabled =
     activeChat === 'dm'
       ? !selectedDmUser
@@ -368,7 +505,16 @@ function GroupChatContainer({
               </button>
             </div>
           </div>
-          <div className="flex-1 overflow-y-auto">
+          {leftTab !== 'users' ? (
+            <input
+              type="search"
+              value={groupQuery}
+              onChange={(event) => setGroupQuery(event.target.value)}
+              placeholder="Search groups"
+              className="rounded-md border border-blue-200 px-3 py-2 text-base lg:text-sm focus:border-blue-500 focus:outline-none"
+            />
+          ) : null}
+          <div className="flex-1 overflow-y-auto" onScroll={handleListScroll}>
             {leftTab === 'all' ? (
               <AllChatsList
                 groups={groups}
@@ -404,11 +550,24 @@ function GroupChatContainer({
                 }}
               />
             ) : (
-              <DirectUserList
-                users={directUsers}
-                selectedUserId={selectedDmUser?.id ?? null}
-                onSelect={handleSelectDirectUser}
-              />
+              <div className="flex flex-col gap-3">
+                <UserSearch
+                  query={userSearchQuery}
+                  results={userSearchResults}
+                  onQueryChange={setUserSearchQuery}
+                  onSelect={(user) => {
+                    setUserSearchQuery('')
+                    handleSelectDirectUser(user)
+                  }}
+                />
+                {userSearchQuery.trim() ? null : (
+                  <DirectUserList
+                    users={directUsers}
+                    selectedUserId={selectedDmUser?.id ?? null}
+                    onSelect={handleSelectDirectUser}
+                  />
+                )}
+              </div>
             )}
           </div>
         </aside>
@@ -462,7 +621,8 @@ function GroupChatContainer({
                           className="min-h-0 h-full overflow-y-auto pr-2 scroll-auto"
                           ref={messageScrollRef}
                         >
-                          <MessageList messages={activeMessages} me={me} />
+                          {olderMessagesButton}
+                          <MessageList token={token} messages={activeMessages} me={me} />
                         </div>
                       ) : null}
                     </div>
@@ -487,7 +647,9 @@ function GroupChatContainer({
                           className="min-h-0 h-full overflow-y-auto pr-2 scroll-auto"
                           ref={messageScrollRef}
                         >
+                          {olderMessagesButton}
                           <MessageList
+                            token={token}
                             messages={activeMessages}
                             me={me}
                             showSenderLabel={false}
@@ -499,11 +661,15 @@ function GroupChatContainer({
                 </>
               )}
             </div>
+            {hasActiveChat && typingLabel ? (
+              <p className="px-8 pt-2 text-xs italic text-slate-500">{typingLabel}</p>
+            ) : null}
             {hasActiveChat ? (
               <Composer
                 value={activeMessageText}
-                onChange={setActiveMessageText}
+                onChange={handleComposerChange}
                 onSubmit={sendActiveMessage}
+                onAttach={sendActiveFile}
                 disabled={isComposerDisabled}
               />
             ) : null}
@@ -538,7 +704,7 @@ function GroupChatContainer({
               <div className="flex items-center gap-2 text-sm text-slate-600">
                 <UsersIcon className="h-4 w-4 text-slate-400" />
                 {selectedGroup
-                  ? `${activeMembers.length} member${activeMembers.length === 1 ? '' : 's'}`
+                  ? `${groupMemberCount} member${groupMemberCount === 1 ? '' : 's'}`
                   : 'Select a group'}
               </div>
               <div className="rounded-lg border border-blue-200 bg-white/90 p-3 text-xs text-slate-600">
@@ -548,7 +714,10 @@ function GroupChatContainer({
                 <p className="text-xs font-semibold uppercase tracking-wide text-slate-500">
                   Members
                 </p>
-                <div className="mt-3 min-h-0 flex-1 space-y-2 overflow-y-auto pr-1">
+                <div
+                  className="mt-3 min-h-0 flex-1 space-y-2 overflow-y-auto pr-1"
+                  onScroll={handleMemberListScroll}
+                >
                   {activeMembers.length === 0 ? (
                     <p className="text-xs text-slate-500">No members yet.</p>
                   ) : null}
@@ -569,8 +738,14 @@ function GroupChatContainer({
                         : 'border-blue-200 bg-white/90 hover:bg-blue-100'
                         }`}
                     >
-                      <span className="grid h-8 w-8 place-items-center rounded-full bg-blue-200 text-xs font-semibold text-blue-800">
+                      <span className="relative grid h-8 w-8 place-items-center rounded-full bg-blue-200 text-xs font-semibold text-blue-800">
                         {(member.full_name || member.username)[0]?.toUpperCase()}
+                        {online[member.user_id] ? (
+                          <span
+                            className="absolute -bottom-0.5 -right-0.5 h-2.5 w-2.5 rounded-full border-2 border-white bg-green-500"
+                            aria-label="Online"
+                          />
+                        ) : null}
                       </span>
                       <div>
                         <p className="text-sm font-semibold text-slate-700">
@@ -586,8 +761,14 @@ function GroupChatContainer({
           ) : (
             <div className="flex min-h-0 flex-1 flex-col gap-4">
               <div className="flex items-center gap-3 rounded-lg border border-blue-200 bg-white/90 px-4 py-3">
-                <span className="grid h-10 w-10 place-items-center rounded-full bg-blue-200 text-sm font-semibold text-blue-800">
+                <span className="relative grid h-10 w-10 place-items-center rounded-full bg-blue-200 text-sm font-semibold text-blue-800">
                   {(selectedDmUser?.full_name || selectedDmUser?.username || '?')[0]?.toUpperCase()}
+                  {selectedDmUser && online[selectedDmUser.id] ? (
+                    <span
+                      className="absolute -bottom-0.5 -right-0.5 h-3 w-3 rounded-full border-2 border-white bg-green-500"
+                      aria-label="Online"
+                    />
+                  ) : null}
                 </span>
                 <div>
                   <p className="text-sm font-semibold text-slate-700">
@@ -1,6 +1,8 @@
 import { useEffect, useRef, useState } from 'react'
 import {
+  MESSAGE_PAGE_SIZE,
   listDirectMessages,
+  sendAttachment,
   sendDirectMessage,
   type DirectMessage,
   type DirectUser,
@@ -11,8 +13,16 @@ type UseDirectMessagesResult = {
   messageText: string
   setMessageText: (value: string) => void
   send: (event: React.FormEvent<HTMLFormElement>) => Promise<void>
+  sendFile: (file: File) => Promise<void>
+  hasOlder: boolean
+  loadOlder: () => Promise<number>
+  typingUserIds: number[]
+  notifyTyping: () => void
 }
 
+// The server shows a typing indicator for 5s, so one frame per 2s keeps it up.
+const TYPING_FRAME_INTERVAL_MS = 2000
+
 export function useDirectMessages(
   token: string,
   selectedUser: DirectUser | null,
@@ -21,12 +31,17 @@ export function useDirectMessages(
 ): UseDirectMessagesResult {
   const [messages, setMessages] = useState<DirectMessage[]>([])
   const [messageText, setMessageText] = useState('')
+  const [hasOlder, setHasOlder] = useState(false)
+  const [typingUserIds, setTypingUserIds] = useState<number[]>([])
   const cacheRef = useRef(new Map<string, DirectMessage[]>())
+  const socketRef = useRef<WebSocket | null>(null)
+  const lastTypingRef = useRef(0)
 
   useEffect(() => {
     if (!token || !selectedUser) {
       setMessages([])
       setMessageText('')
+      setHasOlder(false)
       return
     }
 
@@ -39,6 +54,7 @@ export function useDirectMessages(
       try {
         const data = await listDirectMessages(token, selectedUser.username)
         setMessages(data)
+        setHasOlder(data.length >= MESSAGE_PAGE_SIZE)
         cacheRef.current.set(selectedUser.username, data)
       } catch (err) {
         onError(err instanceof Error ? err.message : 'Failed to load messages')
@@ -49,12 +65,14 @@ export function useDirectMessages(
   }, [onError, selectedUser, token])
 
   useEffect(() => {
+    setTypingUserIds([])
     if (!token || !selectedUser) {
       return
     }
 
     let socket: WebSocket | null = null
     let reconnectTimer: number | null = null
+    let heartbeatTimer: number | null = null
 
     const connect = () => {
       const wsBase = (import.meta.env.VITE_API_URL || 'http://localhost:8000').replace(
@@ -62,8 +80,15 @@ export function useDirectMessages(
         'ws',
       )
       socket = new WebSocket(`${wsBase}/ws/dm/${selectedUser.username}?token=${token}`)
+      socketRef.current = socket
 
       socket.onopen = () => {
+        // Keeps this user shown as online; the server drops silent sockets from presence.
+        heartbeatTimer = window.setInterval(() => {
+          if (socket?.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'ping' }))
+          }
+        }, 25000)
         console.log(`Connected to DM chat with: ${selectedUser.username}`)
       }
 
@@ -84,6 +109,8 @@ export function useDirectMessages(
                 ? (cacheRef.current.get(selectedUser.username) as DirectMessage[])
                 : [...(cacheRef.current.get(selectedUser.username) || []), incoming],
             )
+          } else if (payload.type === 'typing') {
+            setTypingUserIds(payload.data.user_ids)
           }
         } catch (err) {
           return
@@ -91,6 +118,9 @@ export function useDirectMessages(
       }
 
       socket.onclose = (event) => {
+        if (heartbeatTimer) {
+          clearInterval(heartbeatTimer)
+        }
         console.log(`DM socket closed (code: ${event.code}). Reconnecting in 3s...`)
         reconnectTimer = window.setTimeout(() => {
           connect()
@@ -105,16 +135,46 @@ export function useDirectMessages(
     connect()
 
     return () => {
+      socketRef.current = null
       if (socket) {
         socket.onclose = null
         socket.close()
       }
+      if (heartbeatTimer) {
+        clearInterval(heartbeatTimer)
+      }
       if (reconnectTimer) {
         clearTimeout(reconnectTimer)
       }
     }
   }, [selectedUser, token])
 
+  const notifyTyping = () => {
+    if (socketRef.current?.readyState !== WebSocket.OPEN) {
+      return
+    }
+    const now = Date.now()
+    if (now - lastTypingRef.current < TYPING_FRAME_INTERVAL_MS) {
+      return
+    }
+    lastTypingRef.current = now
+    socketRef.current.send(JSON.stringify({ type: 'typing' }))
+  }
+
+  const addSent = (username: string, newMessage: DirectMessage) => {
+    setMessages((prev) =>
+      prev.some((item) => item.id === newMessage.id) ? prev : [...prev, newMessage],
+    )
+    cacheRef.current.set(
+      username,
+      cacheRef.current
+        .get(username)
+        ?.some((item) => item.id === newMessage.id)
+        ? (cacheRef.current.get(username) as DirectMessage[])
+        : [...(cacheRef.current.get(username) || []), newMessage],
+    )
+  }
+
   const send = async (event: React.FormEvent<HTMLFormElement>) => {
     event.preventDefault()
     if (!token || !selectedUser || !messageText.trim()) {
@@ -127,23 +187,72 @@ export function useDirectMessages(
         selectedUser.username,
         messageText.trim(),
       )
-      setMessages((prev) =>
-        prev.some((item) => item.id === newMessage.id) ? prev : [...prev, newMessage],
-      )
-      cacheRef.current.set(
-        selectedUser.username,
-        cacheRef.current
-          .get(selectedUser.username)
-          ?.some((item) => item.id === newMessage.id)
-          ? (cacheRef.current.get(selectedUser.username) as DirectMessage[])
-          : [...(cacheRef.current.get(selectedUser.username) || []), newMessage],
-      )
+      addSent(selectedUser.username, newMessage)
       setMessageText('')
+      // Sending clears the indicator server-side; the next keystroke shows it again.
+      lastTypingRef.current = 0
       onSent?.()
     } catch (err) {
       onError(err instanceof Error ? err.message : 'Failed to send message')
     }
   }
 
-  return { messages, messageText, setMessageText, send }
+  // Uploads a file; any text in the composer goes along as its caption.
+  const sendFile = async (file: File) => {
+    if (!token || !selectedUser) {
+      return
+    }
+
+    try {
+      const newMessage = await sendAttachment(
+        token,
+        { username: selectedUser.username },
+        file,
+        messageText.trim(),
+      )
+      addSent(selectedUser.username, newMessage as DirectMessage)
+      setMessageText('')
+      onSent?.()
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to upload file')
+    }
+  }
+
+  // Prepends the page before the oldest loaded message; returns how many were added.
+  const loadOlder = async () => {
+    if (!token || !selectedUser || messages.length === 0) {
+      return 0
+    }
+
+    try {
+      const data = await listDirectMessages(token, selectedUser.username, messages[0].id)
+      setHasOlder(data.length >= MESSAGE_PAGE_SIZE)
+      const known = new Set(messages.map((item) => item.id))
+      const older = data.filter((item) => !known.has(item.id))
+      if (older.length > 0) {
+        // Functional update so messages that arrived during the fetch are kept.
+        setMessages((prev) => {
+          const merged = [...older, ...prev]
+          cacheRef.current.set(selectedUser.username, merged)
+          return merged
+        })
+      }
+      return older.length
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to load messages')
+      return 0
+    }
+  }
+
+  return {
+    messages,
+    messageText,
+    setMessageText,
+    send,
+    sendFile,
+    hasOlder,
+    loadOlder,
+    typingUserIds,
+    notifyTyping,
+  }
 }
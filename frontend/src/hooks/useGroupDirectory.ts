@@ -0,0 +1,96 @@
+import { useCallback, useEffect, useRef, useState } from 'react'
+import { listGroupDirectory, type Group } from '../utils/api'
+
+const SEARCH_DEBOUNCE_MS = 200
+
+type UseGroupDirectoryResult = {
+  groups: Group[]
+  setGroups: React.Dispatch<React.SetStateAction<Group[]>>
+  query: string
+  setQuery: (query: string) => void
+  hasMore: boolean
+  isLoading: boolean
+  loadMore: () => Promise<void>
+}
+
+// Pages through /groups/directory: the first page on load or per search,
+// further pages only when the caller asks for them.
+export function useGroupDirectory(
+  token: string,
+  onError: (message: string) => void,
+): UseGroupDirectoryResult {
+  const [groups, setGroups] = useState<Group[]>([])
+  const [query, setQuery] = useState('')
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [isLoading, setIsLoading] = useState(false)
+  // Bumped per search so a slow page for an old query is dropped.
+  const requestRef = useRef(0)
+
+  useEffect(() => {
+    if (!token) {
+      setGroups([])
+      setCursor(null)
+      return
+    }
+
+    const request = ++requestRef.current
+    const timer = window.setTimeout(
+      async () => {
+        setIsLoading(true)
+        try {
+          const page = await listGroupDirectory(token, query.trim())
+          if (request === requestRef.current) {
+            setGroups(page.items)
+            setCursor(page.next_cursor)
+          }
+        } catch (err) {
+          if (request === requestRef.current) {
+            onError(err instanceof Error ? err.message : 'Failed to load groups')
+          }
+        } finally {
+          if (request === requestRef.current) {
+            setIsLoading(false)
+          }
+        }
+      },
+      query ? SEARCH_DEBOUNCE_MS : 0,
+    )
+
+    return () => window.clearTimeout(timer)
+  }, [onError, query, token])
+
+  const loadMore = useCallback(async () => {
+    if (!token || !cursor || isLoading) {
+      return
+    }
+
+    const request = requestRef.current
+    setIsLoading(true)
+    try {
+      const page = await listGroupDirectory(token, query.trim(), cursor)
+      if (request === requestRef.current) {
+        setGroups((prev) => {
+          const known = new Set(prev.map((group) => group.id))
+          return [...prev, ...page.items.filter((group) => !known.has(group.id))]
+        })
+        setCursor(page.next_cursor)
+      }
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to load groups')
+    } finally {
+      if (request === requestRef.current) {
+        setIsLoading(false)
+      }
+    }
+  }, [cursor, isLoading, onError, query, token])
+
+  return {
+    groups,
+    setGroups,
+    query,
+    setQuery,
+    hasMore: cursor !== null,
+    isLoading,
+    loadMore,
+  }
+}
@@ -1,8 +1,13 @@
 import { useEffect, useState } from 'react'
-import { joinGroup, listAllGroups, type Group } from '../utils/api'
+import { getGroup, joinGroup, type Group } from '../utils/api'
+import { useGroupDirectory } from './useGroupDirectory'
 
 type UseGroupsResult = {
   groups: Group[]
+  groupQuery: string
+  setGroupQuery: (query: string) => void
+  hasMoreGroups: boolean
+  loadMoreGroups: () => Promise<void>
   selectedGroupId: number | null
   selectedGroup: Group | undefined
   joinTarget: Group | null
@@ -18,46 +23,48 @@ export function useGroups(
   initialGroupId: number | null,
   onError: (message: string) => void,
 ): UseGroupsResult {
-  const [groups, setGroups] = useState<Group[]>([])
+  const {
+    groups,
+    setGroups,
+    query: groupQuery,
+    setQuery: setGroupQuery,
+    hasMore: hasMoreGroups,
+    loadMore: loadMoreGroups,
+  } = useGroupDirectory(token, onError)
+  // A deep-linked group that is not on a loaded directory page.
+  const [linkedGroup, setLinkedGroup] = useState<Group | null>(null)
   const [selectedGroupId, setSelectedGroupId] = useState<number | null>(null)
   const [joinTarget, setJoinTarget] = useState<Group | null>(null)
   const [isJoining, setIsJoining] = useState(false)
 
   useEffect(() => {
-    if (!token) {
+    if (!token || !initialGroupId) {
+      setLinkedGroup(null)
+      setSelectedGroupId(null)
       return
     }
 
+    let cancelled = false
     const load = async () => {
       try {
-        const allGroups = await listAllGroups(token)
-        setGroups(allGroups)
-        const initial = initialGroupId
-          ? allGroups.find((group) => group.id === initialGroupId)
-          : undefined
-        if (initial) {
-          setSelectedGroupId(initial.id)
-        } else {
-          setSelectedGroupId(null)
+        const group = await getGroup(token, initialGroupId)
+        if (!cancelled) {
+          setLinkedGroup(group)
+          setSelectedGroupId(group.id)
         }
       } catch (err) {
-        onError('Failed to load groups')
+        if (!cancelled) {
+          setSelectedGroupId(null)
+          onError('Failed to load groups')
+        }
       }
     }
 
     load()
-  }, [initialGroupId, onError, token])
-
-  useEffect(() => {
-    if (!initialGroupId || groups.length === 0) {
-      return
-    }
-
-    const match = groups.find((group) => group.id === initialGroupId)
-    if (match && match.id !== selectedGroupId) {
-      setSelectedGroupId(match.id)
+    return () => {
+      cancelled = true
     }
-  }, [groups, initialGroupId, selectedGroupId])
+  }, [initialGroupId, onError, token])
 
   const selectGroup = (group: Group) => {
     setSelectedGroupId(group.id)
@@ -84,6 +91,9 @@ export function useGroups(
           item.id === joinTarget.id ? { ...item, is_member: true } : item,
         ),
       )
+      setLinkedGroup((prev) =>
+        prev && prev.id === joinTarget.id ? { ...prev, is_member: true } : prev,
+      )
       setSelectedGroupId(joinTarget.id)
       setJoinTarget(null)
     } catch (err) {
@@ -93,10 +103,16 @@ export function useGroups(
     }
   }
 
-  const selectedGroup = groups.find((group) => group.id === selectedGroupId)
+  const selectedGroup =
+    groups.find((group) => group.id === selectedGroupId) ??
+    (linkedGroup?.id === selectedGroupId ? linkedGroup : undefined)
 
   return {
     groups,
+    groupQuery,
+    setGroupQuery,
+    hasMoreGroups,
+    loadMoreGroups,
     selectedGroupId,
     selectedGroup,
     joinTarget,
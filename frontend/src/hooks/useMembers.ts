@@ -1,41 +1,131 @@
-import { useEffect, useRef, useState } from 'react'
-import { listGroupMembers, type Group, type UserSummary } from '../utils/api'
+import { useCallback, useEffect, useRef, useState } from 'react'
+import { listGroupMembers, type UserSummary } from '../utils/api'
+
+const SEARCH_DEBOUNCE_MS = 200
 
 type UseMembersResult = {
   members: UserSummary[]
+  setMembers: React.Dispatch<React.SetStateAction<UserSummary[]>>
+  memberCount: number
+  query: string
+  setQuery: (query: string) => void
+  hasMore: boolean
+  isLoading: boolean
+  loadMore: () => Promise<void>
+}
+
+type MemberFirstPage = {
+  members: UserSummary[]
+  memberCount: number
+  cursor: string | null
 }
 
+// Loads the first page of a group's members (or of a search) and further
+// pages only on request; the full list is never fetched up front.
 export function useMembers(
   token: string,
-  selectedGroup: Group | undefined,
+  groupId: number | null,
   onError: (message: string) => void,
 ): UseMembersResult {
   const [members, setMembers] = useState<UserSummary[]>([])
-  const cacheRef = useRef(new Map<number, UserSummary[]>())
+  const [memberCount, setMemberCount] = useState(0)
+  const [query, setQuery] = useState('')
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [isLoading, setIsLoading] = useState(false)
+  // First pages by group, so switching back to a group shows it at once.
+  const cacheRef = useRef(new Map<number, MemberFirstPage>())
+  // Bumped per group or search so a slow page for an old one is dropped.
+  const requestRef = useRef(0)
 
   useEffect(() => {
-    if (!token || !selectedGroup || !selectedGroup.is_member) {
+    setQuery('')
+  }, [groupId])
+
+  useEffect(() => {
+    const request = ++requestRef.current
+    if (!token || !groupId) {
       setMembers([])
+      setMemberCount(0)
+      setCursor(null)
       return
     }
 
-    const cached = cacheRef.current.get(selectedGroup.id)
+    const search = query.trim()
+    const cached = search ? undefined : cacheRef.current.get(groupId)
     if (cached) {
-      setMembers(cached)
+      setMembers(cached.members)
+      setMemberCount(cached.memberCount)
+      setCursor(cached.cursor)
     }
 
-    const load = async () => {
-      try {
-        const data = await listGroupMembers(token, selectedGroup.id)
-        setMembers(data)
-        cacheRef.current.set(selectedGroup.id, data)
-      } catch (err) {
-        onError(err instanceof Error ? err.message : 'Failed to load members')
-      }
+    const timer = window.setTimeout(
+      async () => {
+        setIsLoading(true)
+        try {
+          const page = await listGroupMembers(token, groupId, search)
+          if (request !== requestRef.current) {
+            return
+          }
+          setMembers(page.items)
+          setMemberCount(page.member_count)
+          setCursor(page.next_cursor)
+          if (!search) {
+            cacheRef.current.set(groupId, {
+              members: page.items,
+              memberCount: page.member_count,
+              cursor: page.next_cursor,
+            })
+          }
+        } catch (err) {
+          if (request === requestRef.current) {
+            onError(err instanceof Error ? err.message : 'Failed to load members')
+          }
+        } finally {
+          if (request === requestRef.current) {
+            setIsLoading(false)
+          }
+        }
+      },
+      search ? SEARCH_DEBOUNCE_MS : 0,
+    )
+
+    return () => window.clearTimeout(timer)
+  }, [groupId, onError, query, token])
+
+  const loadMore = useCallback(async () => {
+    if (!token || !groupId || !cursor || isLoading) {
+      return
     }
 
-    load()
-  }, [onError, selectedGroup, token])
+    const request = requestRef.current
+    setIsLoading(true)
+    try {
+      const page = await listGroupMembers(token, groupId, query.trim(), cursor)
+      if (request === requestRef.current) {
+        setMembers((prev) => {
+          const known = new Set(prev.map((member) => member.user_id))
+          return [...prev, ...page.items.filter((member) => !known.has(member.user_id))]
+        })
+        setMemberCount(page.member_count)
+        setCursor(page.next_cursor)
+      }
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to load members')
+    } finally {
+      if (request === requestRef.current) {
+        setIsLoading(false)
+      }
+    }
+  }, [cursor, groupId, isLoading, onError, query, token])
 
-  return { members }
+  return {
+    members,
+    setMembers,
+    memberCount,
+    query,
+    setQuery,
+    hasMore: cursor !== null,
+    isLoading,
+    loadMore,
+  }
 }
@@ -1,13 +1,28 @@
 import { useEffect, useRef, useState } from 'react'
-import { listMessages, sendMessage, type Message } from '../utils/api'
+import {
+  MESSAGE_PAGE_SIZE,
+  listMessages,
+  sendAttachment,
+  sendMessage,
+  type Message,
+} from '../utils/api'
 
 type UseMessagesResult = {
   messages: Message[]
   messageText: string
   setMessageText: (value: string) => void
   send: (event: React.FormEvent<HTMLFormElement>) => Promise<void>
+  sendFile: (file: File) => Promise<void>
+  hasOlder: boolean
+  loadOlder: () => Promise<number>
+  onlineUpdates: Record<number, boolean>
+  typingUserIds: number[]
+  notifyTyping: () => void
 }
 
+// The server shows a typing indicator for 5s, so one frame per 2s keeps it up.
+const TYPING_FRAME_INTERVAL_MS = 2000
+
 export function useMessages(
   token: string,
   selectedGroupId: number | null,
@@ -16,11 +31,18 @@ export function useMessages(
 ): UseMessagesResult {
   const [messages, setMessages] = useState<Message[]>([])
   const [messageText, setMessageText] = useState('')
+  const [hasOlder, setHasOlder] = useState(false)
+  // Presence changes pushed on this group's socket since it connected.
+  const [onlineUpdates, setOnlineUpdates] = useState<Record<number, boolean>>({})
+  const [typingUserIds, setTypingUserIds] = useState<number[]>([])
   const cacheRef = useRef(new Map<number, Message[]>())
+  const socketRef = useRef<WebSocket | null>(null)
+  const lastTypingRef = useRef(0)
 
   useEffect(() => {
     if (!token || !selectedGroupId || isMember === false) {
       setMessages([])
+      setHasOlder(false)
       return
     }
     if (isMember === undefined) {
@@ -36,6 +58,7 @@ export function useMessages(
       try {
         const data = await listMessages(token, selectedGroupId)
         setMessages(data)
+        setHasOlder(data.length >= MESSAGE_PAGE_SIZE)
         cacheRef.current.set(selectedGroupId, data)
       } catch (err) {
         onError(err instanceof Error ? err.message : 'Failed to load messages')
@@ -46,12 +69,15 @@ export function useMessages(
   }, [isMember, onError, selectedGroupId, token])
 
   useEffect(() => {
+    setOnlineUpdates({})
+    setTypingUserIds([])
     if (!token || !selectedGroupId || isMember !== true) {
       return
     }
 
     let socket: WebSocket | null = null
     let reconnectTimer: number | null = null
+    let heartbeatTimer: number | null = null
 
     const connect = () => {
       const wsBase = (import.meta.env.VITE_API_URL || 'http://localhost:8000').replace(
@@ -59,8 +85,15 @@ export function useMessages(
         'ws',
       )
       socket = new WebSocket(`${wsBase}/ws/groups/${selectedGroupId}?token=${token}`)
+      socketRef.current = socket
 
       socket.onopen = () => {
+        // Keeps this user shown as online; the server drops silent sockets from presence.
+        heartbeatTimer = window.setInterval(() => {
+          if (socket?.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'ping' }))
+          }
+        }, 25000)
         console.log(`Connected to group chat: ${selectedGroupId}`)
       }
 
@@ -81,6 +114,15 @@ export function useMessages(
                 ? (cacheRef.current.get(selectedGroupId) as Message[])
                 : [...(cacheRef.current.get(selectedGroupId) || []), incoming],
             )
+          } else if (payload.type === 'presence') {
+            const { online, offline }: { online: number[]; offline: number[] } = payload.data
+            setOnlineUpdates((prev) => ({
+              ...prev,
+              ...Object.fromEntries(online.map((userId) => [userId, true])),
+              ...Object.fromEntries(offline.map((userId) => [userId, false])),
+            }))
+          } else if (payload.type === 'typing') {
+            setTypingUserIds(payload.data.user_ids)
           }
         } catch (err) {
           return
@@ -88,6 +130,14 @@ export function useMessages(
       }
 
       socket.onclose = (event) => {
+        if (heartbeatTimer) {
+          clearInterval(heartbeatTimer)
+        }
+        if (event.code === 1008) {
+          // Policy close: banned, group deleted or not a member any more.
+          console.log(`Group chat socket closed: ${event.reason || 'access revoked'}`)
+          return
+        }
         console.log(`Group chat socket closed (code: ${event.code}). Reconnecting in 3s...`)
         // Try to reconnect after 3 seconds
         reconnectTimer = window.setTimeout(() => {
@@ -105,16 +155,46 @@ export function useMessages(
     connect()
 
     return () => {
+      socketRef.current = null
       if (socket) {
         socket.onclose = null // Prevent reconnect loop on unmount
         socket.close()
       }
+      if (heartbeatTimer) {
+        clearInterval(heartbeatTimer)
+      }
       if (reconnectTimer) {
         clearTimeout(reconnectTimer)
       }
     }
   }, [isMember, selectedGroupId, token])
 
+  const notifyTyping = () => {
+    if (socketRef.current?.readyState !== WebSocket.OPEN) {
+      return
+    }
+    const now = Date.now()
+    if (now - lastTypingRef.current < TYPING_FRAME_INTERVAL_MS) {
+      return
+    }
+    lastTypingRef.current = now
+    socketRef.current.send(JSON.stringify({ type: 'typing' }))
+  }
+
+  const addSent = (groupId: number, newMessage: Message) => {
+    setMessages((prev) =>
+      prev.some((item) => item.id === newMessage.id) ? prev : [...prev, newMessage],
+    )
+    cacheRef.current.set(
+      groupId,
+      cacheRef.current
+        .get(groupId)
+        ?.some((item) => item.id === newMessage.id)
+        ? (cacheRef.current.get(groupId) as Message[])
+        : [...(cacheRef.current.get(groupId) || []), newMessage],
+    )
+  }
+
   const send = async (event: React.FormEvent<HTMLFormElement>) => {
     event.preventDefault()
     if (!token || !selectedGroupId || isMember !== true || !messageText.trim()) {
@@ -122,23 +202,71 @@ export function useMessages(
     }
 
     try {
-      const newMessage = await sendMessage(token, selectedGroupId, messageText.trim())
-      setMessages((prev) =>
-        prev.some((item) => item.id === newMessage.id) ? prev : [...prev, newMessage],
-      )
-      cacheRef.current.set(
-        selectedGroupId,
-        cacheRef.current
-          .get(selectedGroupId)
-          ?.some((item) => item.id === newMessage.id)
-          ? (cacheRef.current.get(selectedGroupId) as Message[])
-          : [...(cacheRef.current.get(selectedGroupId) || []), newMessage],
-      )
+      addSent(selectedGroupId, await sendMessage(token, selectedGroupId, messageText.trim()))
       setMessageText('')
+      // Sending clears the indicator server-side; the next keystroke shows it again.
+      lastTypingRef.current = 0
     } catch (err) {
       onError(err instanceof Error ? err.message : 'Failed to send message')
     }
   }
 
-  return { messages, messageText, setMessageText, send }
+  // Uploads a file; any text in the composer goes along as its caption.
+  const sendFile = async (file: File) => {
+    if (!token || !selectedGroupId || isMember !== true) {
+      return
+    }
+
+    try {
+      const newMessage = await sendAttachment(
+        token,
+        { groupId: selectedGroupId },
+        file,
+        messageText.trim(),
+      )
+      addSent(selectedGroupId, newMessage as Message)
+      setMessageText('')
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to upload file')
+    }
+  }
+
+  // Prepends the page before the oldest loaded message; returns how many were added.
+  const loadOlder = async () => {
+    if (!token || !selectedGroupId || messages.length === 0) {
+      return 0
+    }
+
+    try {
+      const data = await listMessages(token, selectedGroupId, messages[0].id)
+      setHasOlder(data.length >= MESSAGE_PAGE_SIZE)
+      const known = new Set(messages.map((item) => item.id))
+      const older = data.filter((item) => !known.has(item.id))
+      if (older.length > 0) {
+        // Functional update so messages that arrived during the fetch are kept.
+        setMessages((prev) => {
+          const merged = [...older, ...prev]
+          cacheRef.current.set(selectedGroupId, merged)
+          return merged
+        })
+      }
+      return older.length
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to load messages')
+      return 0
+    }
+  }
+
+  return {
+    messages,
+    messageText,
+    setMessageText,
+    send,
+    sendFile,
+    hasOlder,
+    loadOlder,
+    onlineUpdates,
+    typingUserIds,
+    notifyTyping,
+  }
 }
@@ -0,0 +1,46 @@
+import { useEffect, useState } from 'react'
+import { queryPresence } from '../utils/api'
+
+// DM threads get no presence frames, so the snapshot is refreshed now and then.
+const PRESENCE_REFRESH_MS = 60000
+
+// Online state for `userIds`: a /presence/query snapshot, overridden by the
+// changes the chat socket has pushed since (`live`).
+export function usePresence(
+  token: string,
+  userIds: number[],
+  live: Record<number, boolean>,
+): Record<number, boolean> {
+  const [snapshot, setSnapshot] = useState<Record<number, boolean>>({})
+  // A new array arrives on every render; only a different set of ids refetches.
+  const idsKey = [...userIds].sort((a, b) => a - b).join(',')
+
+  useEffect(() => {
+    if (!token || !idsKey) {
+      setSnapshot({})
+      return
+    }
+
+    let cancelled = false
+    const ids = idsKey.split(',').map(Number)
+    const load = async () => {
+      try {
+        const data = await queryPresence(token, ids)
+        if (!cancelled) {
+          setSnapshot(Object.fromEntries(data.map((item) => [item.user_id, item.online])))
+        }
+      } catch {
+        // Presence is decoration; the chat works without it.
+      }
+    }
+
+    load()
+    const timer = window.setInterval(load, PRESENCE_REFRESH_MS)
+    return () => {
+      cancelled = true
+      window.clearInterval(timer)
+    }
+  }, [idsKey, token])
+
+  return { ...snapshot, ...live }
+}
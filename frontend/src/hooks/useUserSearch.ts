@@ -0,0 +1,44 @@
+import { useEffect, useState } from 'react'
+import { searchUsers, type DirectUser } from '../utils/api'
+
+const SEARCH_DEBOUNCE_MS = 200
+
+type UseUserSearchResult = {
+  query: string
+  setQuery: (query: string) => void
+  results: DirectUser[]
+}
+
+export function useUserSearch(token: string, onError: (message: string) => void): UseUserSearchResult {
+  const [query, setQuery] = useState('')
+  const [results, setResults] = useState<DirectUser[]>([])
+
+  useEffect(() => {
+    const trimmed = query.trim()
+    if (!token || !trimmed) {
+      setResults([])
+      return
+    }
+
+    let cancelled = false
+    const timer = window.setTimeout(async () => {
+      try {
+        const data = await searchUsers(token, trimmed)
+        if (!cancelled) {
+          setResults(data)
+        }
+      } catch (err) {
+        if (!cancelled) {
+          onError(err instanceof Error ? err.message : 'Failed to search users')
+        }
+      }
+    }, SEARCH_DEBOUNCE_MS)
+
+    return () => {
+      cancelled = true
+      window.clearTimeout(timer)
+    }
+  }, [onError, query, token])
+
+  return { query, setQuery, results }
+}
@@ -4,13 +4,13 @@ import AdminGroupForm from '../components/admin/AdminGroupForm'
 import AdminGroupList from '../components/admin/AdminGroupList'
 import AdminMemberManager from '../components/admin/AdminMemberManager'
 import AdminModal from '../components/admin/AdminModal'
+import { useGroupDirectory } from '../hooks/useGroupDirectory'
+import { useMembers } from '../hooks/useMembers'
 import {
   banGroupMember,
   createGroup,
   deleteGroup,
   getMe,
-  listGroupMembers,
-  listAllGroups,
   unbanGroupMember,
   updateGroup,
   type Group,
@@ -22,7 +22,6 @@ function Admin() {
   const navigate = useNavigate()
   const token = useMemo(() => localStorage.getItem('access_token') || '', [])
   const [me, setMe] = useState<User | null>(null)
-  const [groups, setGroups] = useState<Group[]>([])
   const [name, setName] = useState('')
   const [description, setDescription] = useState('')
   const [editingGroupId, setEditingGroupId] = useState<number | null>(null)
@@ -31,12 +30,32 @@ function Admin() {
   const [modalMode, setModalMode] = useState<'edit' | 'delete' | null>(null)
   const [activeGroup, setActiveGroup] = useState<Group | null>(null)
   const [memberGroupId, setMemberGroupId] = useState<number | null>(null)
-  const [members, setMembers] = useState<UserSummary[]>([])
+  // Kept apart from the directory list, which a new search replaces.
+  const [selectedGroup, setSelectedGroup] = useState<Group | null>(null)
   const [error, setError] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const [activeSection, setActiveSection] = useState<
     'overview' | 'groups' | 'members' | 'create'
   >('overview')
+  const {
+    groups,
+    setGroups,
+    query: groupQuery,
+    setQuery: setGroupQuery,
+    hasMore: hasMoreGroups,
+    isLoading: isLoadingGroups,
+    loadMore: loadMoreGroups,
+  } = useGroupDirectory(token, setError)
+  const {
+    members,
+    setMembers,
+    memberCount,
+    query: memberQuery,
+    setQuery: setMemberQuery,
+    hasMore: hasMoreMembers,
+    isLoading: isLoadingMembers,
+    loadMore: loadMoreMembers,
+  } = useMembers(token, memberGroupId, setError)
 
   useEffect(() => {
     if (!token) {
@@ -48,8 +67,6 @@ function Admin() {
       try {
         const user = await getMe(token)
         setMe(user)
-        const allGroups = await listAllGroups(token)
-        setGroups(allGroups)
       } catch (err) {
         localStorage.removeItem('access_token')
         navigate('/login')
@@ -106,6 +123,7 @@ function Admin() {
         description: editDescription || undefined,
       })
       setGroups((prev) => prev.map((group) => (group.id === updated.id ? updated : group)))
+      setSelectedGroup((prev) => (prev?.id === updated.id ? updated : prev))
       setEditingGroupId(null)
       setModalMode(null)
     } catch (err) {
@@ -143,22 +161,9 @@ function Admin() {
     setModalMode('delete')
   }
 
-  const loadMembers = async (groupId: number) => {
-    if (!token) {
-      return
-    }
-
-    try {
-      const data = await listGroupMembers(token, groupId)
-      setMembers(data)
-    } catch (err) {
-      setMembers([])
-    }
-  }
-
-  const handleSelectMemberGroup = async (groupId: number) => {
+  const handleSelectMemberGroup = (groupId: number) => {
     setMemberGroupId(groupId)
-    await loadMembers(groupId)
+    setSelectedGroup(groups.find((group) => group.id === groupId) || null)
   }
 
   const toggleBan = async (member: UserSummary) => {
@@ -177,7 +182,11 @@ function Admin() {
       } else {
         await banGroupMember(token, memberGroupId, member.user_id)
       }
-      await loadMembers(memberGroupId)
+      setMembers((prev) =>
+        prev.map((item) =>
+          item.user_id === member.user_id ? { ...item, is_banned: !member.is_banned } : item,
+        ),
+      )
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to update member')
     } finally {
@@ -185,7 +194,6 @@ function Admin() {
     }
   }
 
-  const selectedGroup = groups.find((group) => group.id === memberGroupId) || null
   const bannedCount = members.filter((member) => member.is_banned).length
 
   if (me && !me.is_admin) {
@@ -266,7 +274,10 @@ function Admin() {
             </nav>
             <div className="mt-6 rounded-xl border border-slate-200 bg-slate-50 p-3">
               <p className="text-xs font-semibold text-slate-600">Quick info</p>
-              <p className="mt-2 text-xs text-slate-500">Groups: {groups.length}</p>
+              <p className="mt-2 text-xs text-slate-500">
+                Groups loaded: {groups.length}
+                {hasMoreGroups ? '+' : ''}
+              </p>
               <p className="text-xs text-slate-500">
                 Selected: {selectedGroup ? selectedGroup.name : 'None'}
               </p>
@@ -297,19 +308,20 @@ function Admin() {
                 </p>
                 <div className="mt-6 grid gap-3 sm:grid-cols-3">
                   <div className="rounded-xl border border-slate-200 bg-slate-50 p-4">
-                    <p className="text-xs text-slate-500">Total groups</p>
+                    <p className="text-xs text-slate-500">Groups loaded</p>
                     <p className="mt-2 text-2xl font-semibold text-slate-900">
                       {groups.length}
+                      {hasMoreGroups ? '+' : ''}
                     </p>
                   </div>
                   <div className="rounded-xl border border-slate-200 bg-slate-50 p-4">
                     <p className="text-xs text-slate-500">Selected members</p>
                     <p className="mt-2 text-2xl font-semibold text-slate-900">
-                      {selectedGroup ? members.length : '--'}
+                      {selectedGroup ? memberCount : '--'}
                     </p>
                   </div>
                   <div className="rounded-xl border border-slate-200 bg-slate-50 p-4">
-                    <p className="text-xs text-slate-500">Banned in group</p>
+                    <p className="text-xs text-slate-500">Banned among loaded</p>
                     <p className="mt-2 text-2xl font-semibold text-slate-900">
                       {selectedGroup ? bannedCount : '--'}
                     </p>
@@ -347,6 +359,11 @@ function Admin() {
             {activeSection === 'groups' ? (
               <AdminGroupList
                 groups={groups}
+                query={groupQuery}
+                hasMore={hasMoreGroups}
+                isLoadingMore={isLoadingGroups}
+                onQueryChange={setGroupQuery}
+                onLoadMore={loadMoreGroups}
                 onEdit={startEdit}
                 onDelete={handleDeleteConfirm}
               />
@@ -354,8 +371,18 @@ function Admin() {
             {activeSection === 'members' ? (
               <AdminMemberManager
                 groups={groups}
+                groupQuery={groupQuery}
+                hasMoreGroups={hasMoreGroups}
+                isLoadingGroups={isLoadingGroups}
+                onGroupQueryChange={setGroupQuery}
+                onLoadMoreGroups={loadMoreGroups}
                 selectedGroupId={memberGroupId}
                 members={members}
+                memberQuery={memberQuery}
+                hasMoreMembers={hasMoreMembers}
+                isLoadingMembers={isLoadingMembers}
+                onMemberQueryChange={setMemberQuery}
+                onLoadMoreMembers={loadMoreMembers}
                 isLoading={isLoading}
                 currentUserId={me?.id ?? null}
                 onSelectGroup={handleSelectMemberGroup}
@@ -36,7 +36,21 @@ export type UserSummary = {
   joined_at: string
 }
 
+export type MemberPage = {
+  items: UserSummary[]
+  member_count: number
+  next_cursor: string | null
+}
+
 
+export type Attachment = {
+  id: number
+  filename: string
+  content_type: string
+  size: number
+  sha256: string
+  has_thumbnail: boolean
+}
 export type DirectMessage = {
   id: number
   thread_id: number
@@ -44,6 +58,7 @@ export type DirectMessage = {
   sender_username: string
   sender_name: string
   content: string
+  attachment?: Attachment | null
   created_at: string
 }
 export type Group = {
@@ -52,9 +67,15 @@ export type Group = {
   description: string | null
   created_by: number
   created_at: string
+  member_count?: number
   is_member?: boolean
 }
 
+export type GroupDirectoryPage = {
+  items: Group[]
+  next_cursor: string | null
+}
+
 export type Message = {
   id: number
   group_id: number
@@ -62,6 +83,7 @@ export type Message = {
   sender_username: string
   sender_name: string
   content: string
+  attachment?: Attachment | null
   created_at: string
 }
 
@@ -224,10 +246,28 @@ export async function deleteGroup(token: string, groupId: number) {
   return response.json()
 }
 
-export async function listMessages(token: string, groupId: number): Promise<Message[]> {
-  const response = await fetch(`${API_URL}/groups/${groupId}/messages`, {
-    headers: authHeaders(token),
-  })
+// Matches the server's default page; a shorter page means there is no older history.
+export const MESSAGE_PAGE_SIZE = 50
+
+function messagePageQuery(beforeId?: number) {
+  const params = new URLSearchParams({ limit: String(MESSAGE_PAGE_SIZE) })
+  if (beforeId !== undefined) {
+    params.set('before_id', String(beforeId))
+  }
+  return params.toString()
+}
+
+export async function listMessages(
+  token: string,
+  groupId: number,
+  beforeId?: number,
+): Promise<Message[]> {
+  const response = await fetch(
+    `${API_URL}/groups/${groupId}/messages?${messagePageQuery(beforeId)}`,
+    {
+      headers: authHeaders(token),
+    },
+  )
 
   if (!response.ok) {
     const message = await readErrorMessage(response, 'Failed to load messages')
@@ -259,8 +299,22 @@ export async function sendMessage(
   return response.json()
 }
 
-export async function listAllGroups(token: string): Promise<Group[]> {
-  const response = await fetch(`${API_URL}/groups/all`, {
+export const GROUP_PAGE_SIZE = 50
+
+// One page of the group directory, ordered by name; `query` matches a name prefix.
+export async function listGroupDirectory(
+  token: string,
+  query?: string,
+  cursor?: string | null,
+): Promise<GroupDirectoryPage> {
+  const params = new URLSearchParams({ limit: String(GROUP_PAGE_SIZE) })
+  if (query) {
+    params.set('q', query)
+  }
+  if (cursor) {
+    params.set('cursor', cursor)
+  }
+  const response = await fetch(`${API_URL}/groups/directory?${params.toString()}`, {
     headers: authHeaders(token),
   })
 
@@ -272,6 +326,19 @@ export async function listAllGroups(token: string): Promise<Group[]> {
   return response.json()
 }
 
+export async function getGroup(token: string, groupId: number): Promise<Group> {
+  const response = await fetch(`${API_URL}/groups/${groupId}`, {
+    headers: authHeaders(token),
+  })
+
+  if (!response.ok) {
+    const message = await readErrorMessage(response, 'Failed to load group')
+    throw new Error(message)
+  }
+
+  return response.json()
+}
+
 export async function joinGroup(token: string, groupId: number) {
   const response = await fetch(`${API_URL}/groups/${groupId}/join`, {
     method: 'POST',
@@ -312,6 +379,20 @@ export async function getUserByUsername(token: string, username: string): Promis
   return response.json()
 }
 
+export async function searchUsers(token: string, query: string): Promise<DirectUser[]> {
+  const params = new URLSearchParams({ q: query })
+  const response = await fetch(`${API_URL}/users/search?${params.toString()}`, {
+    headers: authHeaders(token),
+  })
+
+  if (!response.ok) {
+    const message = await readErrorMessage(response, 'Failed to search users')
+    throw new Error(message)
+  }
+
+  return response.json()
+}
+
 export async function updateMe(
   token: string,
   payload: {
@@ -338,8 +419,24 @@ export async function updateMe(
   return response.json()
 }
 
-export async function listGroupMembers(token: string, groupId: number): Promise<UserSummary[]> {
-  const response = await fetch(`${API_URL}/groups/${groupId}/members`, {
+export const MEMBER_PAGE_SIZE = 100
+
+// One page of a group's members, ordered by user id; `query` matches a
+// username or full-name prefix.
+export async function listGroupMembers(
+  token: string,
+  groupId: number,
+  query?: string,
+  cursor?: string | null,
+): Promise<MemberPage> {
+  const params = new URLSearchParams({ limit: String(MEMBER_PAGE_SIZE) })
+  if (query) {
+    params.set('q', query)
+  }
+  if (cursor) {
+    params.set('cursor', cursor)
+  }
+  const response = await fetch(`${API_URL}/groups/${groupId}/members?${params.toString()}`, {
     headers: authHeaders(token),
   })
 
@@ -367,13 +464,82 @@ export async function listDirectUsers(token: string): Promise<DirectUser[]> {
 export async function listDirectMessages(
   token: string,
   username: string,
+  beforeId?: number,
 ): Promise<DirectMessage[]> {
-  const response = await fetch(`${API_URL}/dm/with/${username}/messages`, {
+  const response = await fetch(
+    `${API_URL}/dm/with/${username}/messages?${messagePageQuery(beforeId)}`,
+    {
+      headers: authHeaders(token),
+    },
+  )
+
+  if (!response.ok) {
+    const message = await readErrorMessage(response, 'Failed to load messages')
+    throw new Error(message)
+  }
+
+  return response.json()
+}
+
+export async function sendAttachment(
+  token: string,
+  target: { groupId: number } | { username: string },
+  file: File,
+  content = '',
+): Promise<Message | DirectMessage> {
+  const path =
+    'groupId' in target
+      ? `/groups/${target.groupId}/attachments`
+      : `/dm/with/${target.username}/attachments`
+  const body = new FormData()
+  body.append('file', file)
+  body.append('content', content)
+  const response = await fetch(`${API_URL}${path}`, {
+    method: 'POST',
     headers: authHeaders(token),
+    body,
   })
 
   if (!response.ok) {
-    const message = await readErrorMessage(response, 'Failed to load messages')
+    const message = await readErrorMessage(response, 'Failed to upload file')
+    throw new Error(message)
+  }
+
+  return response.json()
+}
+
+export async function fetchAttachment(token: string, attachment: Attachment, thumbnail = false) {
+  const suffix = thumbnail ? '/thumbnail' : ''
+  const response = await fetch(`${API_URL}/attachments/${attachment.id}${suffix}`, {
+    headers: authHeaders(token),
+  })
+
+  if (!response.ok) {
+    const message = await readErrorMessage(response, 'Failed to load file')
+    throw new Error(message)
+  }
+
+  return response.blob()
+}
+
+export type Presence = {
+  user_id: number
+  online: boolean
+  last_seen: string | null
+}
+
+export async function queryPresence(token: string, userIds: number[]): Promise<Presence[]> {
+  const response = await fetch(`${API_URL}/presence/query`, {
+    method: 'POST',
+    headers: {
+      ...authHeaders(token),
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ user_ids: userIds }),
+  })
+
+  if (!response.ok) {
+    const message = await readErrorMessage(response, 'Failed to load presence')
     throw new Error(message)
   }
 